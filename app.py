@@ -17,10 +17,16 @@ from microservices.re_run_batch.controller import re_run_batch_controller
 from microservices.fetch_batch_results.controller import fetch_batch_results_controller
 from microservices.export_batch_results.controller import export_batch_results_controller
 from microservices.fetch_all_batches.controller import fetch_all_batches_controller
+from microservices.fetch_batch_job.controller import fetch_batch_job_controller
+from microservices.fetch_batch_summary.controller import fetch_batch_summary_controller
+from batch_engine.jobs import fail_interrupted_jobs
 
 app = Flask(__name__)
 CORS(app)  # Enable Cross-Origin Resource Sharing for frontend requests
 
+# Batch jobs of a previous process died with it; report them as failed straight away
+fail_interrupted_jobs()
+
 # Root endpoint
 @app.route("/", methods=["GET"])
 def healthcheck():
@@ -96,6 +102,16 @@ def process_batch():
 def re_run_batch():
     return re_run_batch_controller()
 
+# Fetch background job status for process_batch / re_run_batch (GET)
+@app.route("/fetch_batch_job/<job_id>", methods=["GET"])
+def fetch_batch_job(job_id):
+    return fetch_batch_job_controller(job_id)
+
+# Fetch the match summary and per-rule counts of a batch (GET)
+@app.route("/fetch_batch_summary/<batch_id>", methods=["GET"])
+def fetch_batch_summary(batch_id):
+    return fetch_batch_summary_controller(batch_id)
+
 # Fetch batch results (POST)
 @app.route("/fetch_batch_results", methods=["POST"])
 def fetch_batch_results():
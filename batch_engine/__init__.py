@@ -0,0 +1 @@
+# Shared matching engine used by the process_batch and re_run_batch services
@@ -0,0 +1,97 @@
+import collections
+
+from batch_engine.result_store import CATEGORIES
+
+# Summary of a batch stored in its batch_data.json entry when the batch is matched, so
+# summaries and export reports do not have to read the result files
+SUMMARY_VERSION = 1
+
+
+def _rate(count, total):
+    return round(100 * count / total, 2) if total else 0
+
+
+def result_counts(counts):
+    """Totals and rates of the result category counts, as shown in the report."""
+    total_source = counts['matched'] + counts['suspected'] + counts['unmatched_source']
+    total_target = counts['matched'] + counts['suspected'] + counts['unmatched_target']
+    return {
+        'total_source': total_source,
+        'total_target': total_target,
+        **{category: counts[category] for category in CATEGORIES},
+        'match_rate': _rate(counts['matched'], total_source),
+        'suspected_rate': _rate(counts['suspected'], total_source),
+        'unmatched_source_rate': _rate(counts['unmatched_source'], total_source),
+        'unmatched_target_rate': _rate(counts['unmatched_target'], total_target)
+    }
+
+
+class RuleCounts:
+    """
+    Matched entries and suspected targets credited to each rule, counted as results are
+    produced. Rules are listed in the order they first credit a matched entry, then a
+    suspected target, as the export report counts them.
+    """
+    def __init__(self):
+        self.matched = collections.Counter()
+        self.suspected = collections.Counter()
+        self.names = {}
+
+    def _credit(self, counter, entry):
+        rule_id = entry.get('rule_id')
+        if rule_id is not None:
+            counter[rule_id] += 1
+            if rule_id not in self.names:
+                self.names[rule_id] = (entry.get('rule') or {}).get('rule_name')
+
+    def add(self, matched, suspected):
+        for entry in matched:
+            self._credit(self.matched, entry)
+        for group in suspected:
+            for target in group.get('targets', []):
+                self._credit(self.suspected, target)
+
+    def as_list(self):
+        rule_ids = list(self.matched) + [rule_id for rule_id in self.suspected if rule_id not in self.matched]
+        return [{'rule_id': rule_id, 'rule_name': self.names.get(rule_id),
+                 'matched': self.matched[rule_id], 'suspected': self.suspected[rule_id]} for rule_id in rule_ids]
+
+
+def batch_summary(result_files, rule_counts, stage_timings, blocking=None):
+    """
+    The summary stored with a batch: result counts and rates, per-rule counts, stage
+    timings and, per rule with a candidate index, the pairs it evaluated and pruned.
+    """
+    return {
+        'version': SUMMARY_VERSION,
+        **result_counts({category: result_files[category]['count'] for category in CATEGORIES}),
+        'rules': rule_counts.as_list(),
+        'stage_timings': stage_timings,
+        'blocking': list((blocking or {}).values())
+    }
+
+
+def stored_summary(batch_info):
+    """The summary stored with a batch entry, or None for batches matched before summaries were kept."""
+    summary = batch_info.get('summary')
+    if not summary or summary.get('version') != SUMMARY_VERSION:
+        return None
+    return summary
+
+
+def summarize_results(results):
+    """A batch summary read from its result files, for batches without a stored summary. Has no stage timings or blocking counts."""
+    rule_counts = RuleCounts()
+    rule_counts.add(results.iter_entries('matched'), results.iter_entries('suspected'))
+    return {
+        'version': SUMMARY_VERSION,
+        **result_counts({category: results.count(category) for category in CATEGORIES}),
+        'rules': rule_counts.as_list(),
+        'stage_timings': None,
+        'blocking': None
+    }
+
+
+def matched_rule_counter(summary):
+    """Counter of the matched entries per rule of a summary, in its rule order."""
+    return collections.Counter({rule['rule_id']: rule['matched'] for rule in summary['rules'] if rule['matched']})
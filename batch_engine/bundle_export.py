@@ -0,0 +1,131 @@
+import collections
+import csv
+import io
+import json
+import os
+import zipfile
+from tempfile import TemporaryDirectory
+
+from batch_engine.excel_export import report_data, report_summary, result_table, rule_insights
+from batch_engine.result_store import CATEGORIES, json_safe
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+# Export formats besides the Excel report: a zip of one file per result category plus
+# summary.json with the metrics of the Report sheet
+BUNDLE_FORMATS = ('csv', 'parquet', 'ndjson')
+SUMMARY_NAME = 'summary.json'
+# Rows per Parquet row group, the unit the rows are buffered and written in
+PARQUET_ROW_GROUP_ROWS = 50000
+
+
+def _summary_key(label):
+    return label.lower().replace(' (%)', '_pct').replace(' ', '_')
+
+
+def _write_csv(zf, arcname, results, category, rule_counter):
+    header, rows = result_table(results, category, rule_counter)
+    with zf.open(arcname, 'w') as member, io.TextIOWrapper(member, encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(rows)
+
+
+def _write_ndjson(zf, arcname, results, category, rule_counter):
+    # The entries as stored, nested records and targets included
+    with zf.open(arcname, 'w') as member, io.TextIOWrapper(member, encoding='utf-8') as f:
+        for entry in results.iter_entries(category):
+            if category in ('matched', 'suspected') and entry.get('rule_id') is not None:
+                rule_counter[entry['rule_id']] += 1
+            f.write(json.dumps(json_safe(entry), ensure_ascii=False, allow_nan=False) + '\n')
+
+
+def _parquet_table(header, rows, schema, as_text):
+    columns = list(zip(*rows)) if rows else [()] * len(header)
+    if as_text:
+        columns = [[None if value is None else str(value) for value in column] for column in columns]
+    if schema is not None:
+        return pa.table(dict(zip(header, columns)), schema=schema)
+    table = pa.table(dict(zip(header, columns)))
+    # Columns without a value in the first row group are typed as text
+    schema = pa.schema([pa.field(field.name, pa.string()) if pa.types.is_null(field.type) else field
+                        for field in table.schema])
+    return table.cast(schema)
+
+
+def _write_parquet_file(path, header, rows, as_text):
+    writer = None
+    try:
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) == PARQUET_ROW_GROUP_ROWS:
+                table = _parquet_table(header, batch, writer and writer.schema, as_text)
+                writer = writer or pq.ParquetWriter(path, table.schema)
+                writer.write_table(table)
+                batch = []
+        if batch or writer is None:
+            table = _parquet_table(header, batch, writer and writer.schema, as_text)
+            writer = writer or pq.ParquetWriter(path, table.schema)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def _write_parquet(zf, arcname, results, category, rule_counter, temp_dir):
+    path = os.path.join(temp_dir, arcname)
+    counter = collections.Counter()
+    header, rows = result_table(results, category, counter)
+    try:
+        # Column types are those of the first row group
+        _write_parquet_file(path, header, rows, as_text=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, TypeError):
+        # A column with values of different types further on: write every column as text
+        print(f"[DEBUG] Mixed column types in {category}, exporting it to Parquet as text")
+        counter = collections.Counter()
+        header, rows = result_table(results, category, counter)
+        _write_parquet_file(path, header, rows, as_text=True)
+    rule_counter.update(counter)
+    # Parquet pages are compressed already
+    zf.write(path, arcname, compress_type=zipfile.ZIP_STORED)
+    os.remove(path)
+
+
+def results_summary(batch_id, batch_info, summary, rule_counter):
+    """The Report sheet's Batch Summary and Rule Insights as a JSON document."""
+    batch = {_summary_key(label): value for label, value in report_data(batch_id, batch_info, summary)}
+    most_common_rule = rule_counter.most_common(1)[0] if rule_counter else (None, 0)
+    insights = {_summary_key(label): value for label, value in rule_insights(rule_counter)}
+    insights['most_frequent_rule'] = most_common_rule[0]
+    insights['rule_counts'] = {str(rule_id): count for rule_id, count in sorted(rule_counter.items(), key=str)}
+    return {'batch_summary': batch, 'rule_insights': insights}
+
+
+def write_results_bundle(path, export_format, batch_id, batch_info, results):
+    """
+    Write a batch's results to the zip file path in export_format ('csv', 'parquet' or
+    'ndjson'): one file per result category, streamed from the result store, and
+    summary.json. CSV and Parquet hold the tables of the Excel sheets; NDJSON holds the
+    entries as stored.
+    """
+    if export_format == 'parquet' and not PARQUET_AVAILABLE:
+        raise ValueError("Parquet export requires pyarrow")
+    summary, rule_counter, counting = report_summary(batch_info, results)
+    with zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_DEFLATED) as zf, TemporaryDirectory() as temp_dir:
+        for category in CATEGORIES:
+            arcname = f"{category}.{export_format}"
+            # Only matched and suspected rows count towards the rule insights, as in the report
+            counter = rule_counter if counting and category in ('matched', 'suspected') else collections.Counter()
+            if export_format == 'csv':
+                _write_csv(zf, arcname, results, category, counter)
+            elif export_format == 'parquet':
+                _write_parquet(zf, arcname, results, category, counter, temp_dir)
+            else:
+                _write_ndjson(zf, arcname, results, category, counter)
+        zf.writestr(SUMMARY_NAME, json.dumps(results_summary(batch_id, batch_info, summary, rule_counter), indent=4))
@@ -0,0 +1,51 @@
+from collections import defaultdict
+
+from batch_engine.results import apply_rationale
+
+
+def _target_group(entry):
+    # A numeric combination links one source to several targets but counts as a single match
+    return tuple(entry['combination']) if 'combination' in entry else entry['target_index']
+
+
+def classify_matches(matched):
+    """
+    Split raw matches into final matched entries and suspected groups in linear time.
+    matched holds one entry per (source, target) pair in pair order, reporting the rule
+    match_records chose by priority; sources linked to more than one target are
+    suspected and grouped per source. Rationale is formatted once per final entry.
+    Returns (unique_matches, suspected_flat, matched_final, suspected).
+    """
+    unique_matches = list(matched)
+    if len({(m['source_index'], m['target_index']) for m in unique_matches}) != len(unique_matches):
+        # Keeping either entry would override the rule priority match_records settled on
+        raise ValueError("classify_matches expects one match per (source, target) pair")
+
+    targets_per_source = defaultdict(set)
+    for m in unique_matches:
+        targets_per_source[m['source_index']].add(_target_group(m))
+    duplicate_src = {src_idx for src_idx, groups in targets_per_source.items() if len(groups) > 1}
+
+    suspected_flat = []
+    matched_final = []
+    suspected_grouped = defaultdict(list)
+    for m in unique_matches:
+        if m['source_index'] in duplicate_src:
+            suspected_flat.append(m)
+            suspected_grouped[m['source_index']].append(m)
+        else:
+            matched_final.append(apply_rationale(m))
+
+    # Format as array of objects: {source_index, source_record, targets: [all suspected matches]}
+    suspected = []
+    for src_idx, matches in suspected_grouped.items():
+        source_record = matches[0]['source_record']
+        suspected.append({
+            'source_index': src_idx,
+            'source_record': source_record,
+            'targets': [
+                apply_rationale({k: v for k, v in m.items() if k not in ('source_index', 'source_record')}, source=source_record)
+                for m in matches
+            ]
+        })
+    return unique_matches, suspected_flat, matched_final, suspected
@@ -0,0 +1,81 @@
+import datetime
+import numbers
+
+import numpy as np
+import pandas as pd
+
+
+def _is_day_number(value):
+    """Integral numbers, which is how a yyyymmdd column of a CSV is read."""
+    if isinstance(value, bool) or not isinstance(value, numbers.Real):
+        return False
+    return isinstance(value, numbers.Integral) or (np.isfinite(value) and float(value).is_integer())
+
+
+def parse_dates(values):
+    """
+    Parse a column once into a datetime64[ns] array in UTC. Text and datetimes are
+    parsed in any format (naive values taken as UTC), integral numbers as yyyymmdd;
+    anything else, and whatever fails to parse, becomes NaT.
+    """
+    series = pd.Series(values, dtype=object)
+    day_numbers = series.map(_is_day_number).astype(bool)
+    texts = series.map(lambda value: isinstance(value, (str, datetime.date, np.datetime64))).astype(bool)
+    dates = np.full(len(series), np.datetime64('NaT'), dtype='datetime64[ns]')
+    if day_numbers.any():
+        parsed = pd.to_datetime(series[day_numbers].map(lambda value: str(int(value))), errors='coerce',
+                                format='%Y%m%d', utc=True)
+        dates[day_numbers.to_numpy()] = parsed.dt.tz_localize(None).to_numpy(dtype='datetime64[ns]')
+    if texts.any():
+        parsed = pd.to_datetime(series[texts], errors='coerce', format='mixed', utc=True)
+        dates[texts.to_numpy()] = parsed.dt.tz_localize(None).to_numpy(dtype='datetime64[ns]')
+    return dates
+
+
+class DateRangeIndex:
+    """
+    Candidate pairs for "Date Range" rules: targets dated within options.tolerance_days
+    of the source date (see parse_dates). Target dates are sorted once and each source window is found
+    with two searchsorted calls. Rows whose date cannot be parsed are left to the
+    code_block against every row of the other side. Without a tolerance the window
+    is unknown and every pair is evaluated.
+    """
+    def __init__(self, target_values, options=None):
+        self.tolerance = None
+        tolerance_days = (options or {}).get('tolerance_days')
+        if tolerance_days is None:
+            return
+        try:
+            tolerance = np.timedelta64(int(round(float(tolerance_days) * 86400)), 's')
+            target_dates = parse_dates(target_values)
+        except (TypeError, ValueError, OverflowError) as e:
+            print(f"[DEBUG] Date Range index unavailable, evaluating every pair: {e}")
+            return
+        self.tolerance = tolerance
+        target_valid = ~np.isnat(target_dates)
+        self.unparsed_targets = np.flatnonzero(~target_valid)
+        order = np.flatnonzero(target_valid)
+        self.order = order[np.argsort(target_dates[order], kind='stable')]
+        self.sorted_dates = target_dates[self.order]
+        self.all_target_positions = list(range(len(target_values)))
+
+    def candidates(self, source_values):
+        if self.tolerance is None:
+            return None
+        try:
+            source_dates = parse_dates(source_values)
+        except (TypeError, ValueError, OverflowError) as e:
+            print(f"[DEBUG] Date Range index unavailable, evaluating every pair: {e}")
+            return None
+        candidates = {}
+        source_valid = ~np.isnat(source_dates)
+        lower = np.searchsorted(self.sorted_dates, source_dates - self.tolerance, side='left')
+        upper = np.searchsorted(self.sorted_dates, source_dates + self.tolerance, side='right')
+        for src_pos in range(len(source_values)):
+            if not source_valid[src_pos]:
+                candidates[src_pos] = self.all_target_positions
+                continue
+            tgt_positions = np.concatenate((self.order[lower[src_pos]:upper[src_pos]], self.unparsed_targets))
+            if len(tgt_positions):
+                candidates[src_pos] = np.sort(tgt_positions).tolist()
+        return candidates
@@ -0,0 +1,254 @@
+import json
+import os
+import threading
+
+from batch_engine.batch_summary import RuleCounts, batch_summary
+from batch_engine.classification import classify_matches
+from batch_engine.ingestion import load_upload
+from batch_engine.matching import match_records
+from batch_engine.result_store import ResultWriter, write_results
+from batch_engine.results import scored_entry
+from batch_engine.row_store import RowStore
+from batch_engine.rule_hits import RuleHits, load_rule_hits
+from batch_engine.streaming import csv_columns, source_chunks, streaming_enabled
+
+DB_JSONS_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.dirname(__file__)), 'db_jsons'))
+RULE_DATA_PATH = os.path.join(DB_JSONS_DIR, 'rule_data.json')
+BATCH_DATA_PATH = os.path.join(DB_JSONS_DIR, 'batch_data.json')
+BATCH_INFORMATION_DIR = 'batch_information'
+
+# Batch ids handed out to queued jobs that have not been recorded yet
+_batch_id_lock = threading.Lock()
+_reserved_batch_ids = set()
+
+
+def load_frame(path):
+    """
+    DataFrame of an uploaded file, with its columns sorted alphabetically so matching
+    behaves the same whatever the column order of the upload.
+    """
+    return load_upload(path).sort_index(axis=1)
+
+
+def active_rules():
+    """Active rules from rule_data.json, sorted by rule_id for a consistent processing order."""
+    with open(RULE_DATA_PATH, 'r', encoding='utf-8') as f:
+        all_rules = json.load(f)
+    all_rules.sort(key=lambda r: r.get('rule_id', 0))
+    return [r for r in all_rules if r.get('is_active') is True]
+
+
+def applicable_rules(rules, source_columns, target_columns):
+    """Rules whose source/target fields both exist in the files."""
+    return [rule for rule in rules
+            if rule.get('source_field') in source_columns and rule.get('target_field') in target_columns]
+
+
+class BatchResults:
+    """
+    Outcome of reconcile(): the matched entries, the suspected groups, the index labels
+    of unmatched source and target rows, the RowStores the entries were built from, and
+    counts of each step in stats.
+    """
+    def __init__(self, matched, suspected, unmatched_source, unmatched_target, source_store, target_store, stats):
+        self.matched = matched
+        self.suspected = suspected
+        self.unmatched_source = unmatched_source
+        self.unmatched_target = unmatched_target
+        self.source_store = source_store
+        self.target_store = target_store
+        self.stats = stats
+
+
+def reconcile(df_source, df_target, rules, tracker=None, previous=None, rule_hits=None, target_store=None,
+              target_indexes=None, blocking=None):
+    """
+    Match df_source against df_target with the given rules and classify the matches.
+    Rules run in priority order with early exit per pair and one-to-many candidates are
+    settled by score (see match_records, which tracker, previous, rule_hits,
+    target_indexes and blocking are passed to); each source then ends up matched, suspected or
+    unmatched. target_store can be given to reuse the target's RowStore across calls.
+    Returns a BatchResults.
+    """
+    # Convert each DataFrame once; record dicts are only built for rows that match
+    source_store = RowStore(df_source)
+    target_store = RowStore(df_target) if target_store is None else target_store
+    matched = []
+    unmatched_source = set(df_source.index)
+    unmatched_target = set(df_target.index)
+    for src_pos, tgt_pos, state in match_records(rules, df_source, df_target, source_store, target_store, tracker,
+                                                 target_indexes, previous, rule_hits, blocking):
+        entry = scored_entry(state, src_pos, tgt_pos, source_store, target_store)
+        matched.append(entry)
+        unmatched_source.discard(entry['source_index'])
+        unmatched_target.discard(entry['target_index'])
+
+    if tracker:
+        tracker.stage('classifying', 80)
+    # One pass over the scored matches: suspected vs matched per source
+    unique_matches, _, matched_final, suspected = classify_matches(matched)
+    stats = {
+        'total_matches': len(matched),
+        'unique_matches': len(unique_matches),
+        'matched': len(matched_final),
+        'suspected': len(suspected),
+        'unmatched_source': len(unmatched_source),
+        'unmatched_target': len(unmatched_target)
+    }
+    return BatchResults(matched_final, suspected, list(unmatched_source), list(unmatched_target),
+                        source_store, target_store, stats)
+
+
+def stream_batch(tracker, batch_dir, source_path, df_target, rules, rule_counts, blocking):
+    """
+    Match a source CSV too large to load against df_target. The source is read in
+    chunks; each chunk is reconciled against target-side candidate indexes built once
+    and written straight to the batch's result files, so memory holds the target side
+    plus one source chunk. Classification is per source record, so a chunk has
+    everything it needs. The chunks' results are counted into rule_counts and their
+    pruned pairs into blocking. Returns the
+    result files summary of ResultWriter.close().
+    """
+    target_store = RowStore(df_target)
+    unmatched_target = set(df_target.index)
+    target_indexes = {}
+    writer = ResultWriter(batch_dir)
+    writer.add_records('target', target_store)
+    for chunk_no, (chunk, done) in enumerate(source_chunks(source_path)):
+        results = reconcile(chunk, df_target, rules, target_store=target_store, target_indexes=target_indexes,
+                            blocking=blocking)
+        writer.add_records('source', results.source_store)
+        for entry in results.matched:
+            writer.add('matched', entry)
+        for group in results.suspected:
+            writer.add('suspected', group)
+        writer.add_unmatched('unmatched_source', results.unmatched_source)
+        rule_counts.add(results.matched, results.suspected)
+        unmatched_target.intersection_update(results.unmatched_target)
+        print(f"[DEBUG] Streaming chunk {chunk_no}: {len(chunk)} source rows, "
+              f"{results.stats['matched']} matched, {results.stats['suspected']} suspected")
+        tracker.progress(20 + 60 * done)
+    writer.add_unmatched('unmatched_target', [label for label in target_store.index if label in unmatched_target])
+    return writer.close(rules)
+
+
+def run_batch(tracker, batch_dir, source_path, target_path, previous_dir=None):
+    """
+    Load, match, classify and store the batch whose uploads are source_path and
+    target_path, reporting to tracker. previous_dir is a batch over the same files whose recorded rule hits can be reused.
+    Source CSVs above the streaming threshold are matched chunk by chunk instead.
+    Returns {category: {'file_path', 'count'}} of the stored results and the batch's
+    summary (see batch_summary), which closes the tracker's stage timings.
+    """
+    tracker.stage('loading', 0)
+    # Very large source CSVs are never loaded whole; they are matched chunk by chunk
+    streaming = streaming_enabled(source_path)
+    try:
+        if streaming:
+            df_source = None
+            source_columns = csv_columns(source_path)
+            print(f"[DEBUG] Batch engine: Streaming source file {source_path} in chunks")
+        else:
+            df_source = load_frame(source_path)
+            source_columns = df_source.columns
+            print(f"[DEBUG] Batch engine: Loaded source dataframe from {source_path}")
+            print(f"[DEBUG] Batch engine: Source DataFrame shape: {df_source.shape}")
+            print(f"[DEBUG] Batch engine: Source DataFrame columns: {sorted(df_source.columns.tolist())}")
+        df_target = load_frame(target_path)
+        print(f"[DEBUG] Batch engine: Loaded target dataframe from {target_path}")
+        print(f"[DEBUG] Batch engine: Target DataFrame shape: {df_target.shape}")
+        print(f"[DEBUG] Batch engine: Target DataFrame columns: {sorted(df_target.columns.tolist())}")
+    except Exception as e:
+        raise ValueError(f"Error loading files: {e}")
+
+    rules = applicable_rules(active_rules(), source_columns, df_target.columns)
+    print(f"[DEBUG] Batch engine using {len(rules)} rules:")
+    for rule in rules:
+        print(f"  - Rule {rule.get('rule_id')}: {rule.get('rule_name')} ({rule.get('source_field')} -> {rule.get('target_field')})")
+
+    # Per-rule counts are kept for the batch summary, so reports do not recount the results,
+    # along with the pairs each rule's candidate index pruned
+    rule_counts = RuleCounts()
+    blocking = {}
+    if streaming:
+        tracker.stage('matching', 20)
+        result_files = stream_batch(tracker, batch_dir, source_path, df_target, rules, rule_counts, blocking)
+        return result_files, batch_summary(result_files, rule_counts, tracker.finish(), blocking)
+
+    # Each rule's hits are kept so a re-run only evaluates the rules edited since
+    source_file, target_file = os.path.basename(source_path), os.path.basename(target_path)
+    previous = load_rule_hits(previous_dir, source_file, target_file) if previous_dir else None
+    rule_hits = RuleHits(source_file, target_file)
+    results = reconcile(df_source, df_target, rules, tracker, previous, rule_hits, blocking=blocking)
+    rule_counts.add(results.matched, results.suspected)
+
+    print("[DEBUG] Batch engine matching summary:")
+    print(f"  - Total matches found: {results.stats['total_matches']}")
+    print(f"  - Unique matched pairs: {results.stats['unique_matches']}")
+    print(f"  - Suspected matches: {results.stats['suspected']}")
+    print(f"  - Final matched count: {results.stats['matched']}")
+    print(f"  - Unmatched source: {results.stats['unmatched_source']}")
+    print(f"  - Unmatched target: {results.stats['unmatched_target']}")
+
+    tracker.stage('saving', 90)
+    # Records are stored once; results refer to them by row number
+    result_files = write_results(batch_dir, results.source_store, results.target_store, rules, results.matched,
+                                 results.suspected, results.unmatched_source, results.unmatched_target)
+    rule_hits.save(batch_dir)
+    return result_files, batch_summary(result_files, rule_counts, tracker.finish(), blocking)
+
+
+def _recorded_batch_ids():
+    if not os.path.exists(BATCH_DATA_PATH):
+        return set()
+    try:
+        with open(BATCH_DATA_PATH, 'r', encoding='utf-8') as f:
+            return {b.get('batch_id') for b in json.load(f)}
+    except Exception:
+        return set()
+
+
+def reserve_batch_id():
+    """
+    The id of a batch whose directory was just created, taken when its job is queued
+    so batches queued together never share one. Ids are 'batch<n>', n counting the
+    batch directories, skipping ids already recorded or reserved.
+    """
+    with _batch_id_lock:
+        taken = _recorded_batch_ids() | _reserved_batch_ids
+        n = len(os.listdir(BATCH_INFORMATION_DIR))
+        while f'batch{n}' in taken:
+            n += 1
+        batch_id = f'batch{n}'
+        _reserved_batch_ids.add(batch_id)
+        return batch_id
+
+
+def record_batch(batch_id, batch_dir, batch_name, result_files, summary):
+    """Add a processed batch and its summary to batch_data.json under its reserved id and return its entry."""
+    result = {
+        'batch_id': batch_id,
+        'batch_dir': batch_dir,
+        'batch_name': batch_name,
+        'matched_data': result_files['matched'],
+        'suspected_data': result_files['suspected'],
+        'unmatched_source_data': result_files['unmatched_source'],
+        'unmatched_target_data': result_files['unmatched_target'],
+        'summary': summary
+    }
+    print(f"[DEBUG] Batch {batch_name} stats - Matched: {result_files['matched']['count']}, Suspected: {result_files['suspected']['count']}, "
+          f"Unmatched Source: {result_files['unmatched_source']['count']}, Unmatched Target: {result_files['unmatched_target']['count']}")
+    try:
+        if os.path.exists(BATCH_DATA_PATH):
+            with open(BATCH_DATA_PATH, 'r', encoding='utf-8') as f:
+                batch_data = json.load(f)
+        else:
+            batch_data = []
+        batch_data.append(result)
+        with open(BATCH_DATA_PATH, 'w', encoding='utf-8') as f:
+            json.dump(batch_data, f, indent=4)
+    except Exception as e:
+        print(f"[ERROR] Failed to log batch summary: {e}")
+    with _batch_id_lock:
+        _reserved_batch_ids.discard(batch_id)
+    return result
@@ -0,0 +1,217 @@
+import collections
+import itertools
+import json
+import math
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.chart import PieChart, Reference
+from openpyxl.styles import Alignment, Font, PatternFill
+from openpyxl.utils import get_column_letter
+
+from batch_engine.batch_summary import matched_rule_counter, result_counts, stored_summary
+from batch_engine.result_store import CATEGORIES
+
+# Bumped whenever the workbook written for the same results changes, so cached exports
+# of the old layout are produced again
+EXPORT_LAYOUT_VERSION = 1
+
+# Column widths are estimated from the header and the first rows of a sheet instead of
+# a second pass over every cell
+WIDTH_SAMPLE_ROWS = 1000
+MIN_COLUMN_WIDTH = 12
+MAX_COLUMN_WIDTH = 40
+
+HEADER_FILL = PatternFill(start_color="002060", end_color="002060", fill_type="solid")  # Dark blue
+ALT_FILL = PatternFill(start_color="305496", end_color="305496", fill_type="solid")  # Lighter blue
+HEADER_FONT = Font(bold=True, color="FFFFFF")  # White
+TITLE_FONT = Font(bold=True, color="FFFFFF", size=13)
+VALUE_FONT = Font(bold=False, color="000000")
+NO_FILL = PatternFill(fill_type=None)
+LEFT = Alignment(horizontal="left", vertical="center")
+CENTER = Alignment(horizontal="center", vertical="center")
+
+
+def _cell_value(value):
+    """A result value as something a worksheet cell holds; nested values become JSON text."""
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return value
+
+
+def _styled(ws, value, font=None, fill=None, alignment=None):
+    cell = WriteOnlyCell(ws, value=value)
+    if font is not None:
+        cell.font = font
+    if fill is not None:
+        cell.fill = fill
+    if alignment is not None:
+        cell.alignment = alignment
+    return cell
+
+
+def _column_widths(rows):
+    widths = collections.defaultdict(int)
+    for row in rows:
+        for col_idx, value in enumerate(row, 1):
+            widths[col_idx] = max(widths[col_idx], len(str(value)) if value else 0)
+    return {col_idx: max(MIN_COLUMN_WIDTH, min(length + 2, MAX_COLUMN_WIDTH)) for col_idx, length in widths.items()}
+
+
+def _append_table(ws, header, header_row, rows):
+    """
+    Append header_row (the header as plain values or styled cells) and then rows,
+    sizing the columns from the header and a sample of the first rows, and put an
+    auto filter over the table. Rows are consumed one at a time.
+    """
+    rows = iter(rows)
+    sample = list(itertools.islice(rows, WIDTH_SAMPLE_ROWS))
+    # A write-only sheet takes its column widths before its first row
+    for col_idx, width in _column_widths([header] + sample).items():
+        ws.column_dimensions[get_column_letter(col_idx)].width = width
+    ws.append(header_row)
+    row_count = 0
+    for row in itertools.chain(sample, rows):
+        ws.append(row)
+        row_count += 1
+    ws.auto_filter.ref = f"A1:{get_column_letter(len(header))}{row_count + 1}"
+
+
+def result_table(results, category, rule_counter=None):
+    """
+    (header, rows) of a category as a flat table, rows being streamed from the result
+    store: one column per entry key for matched and unmatched entries, the record and
+    targets as JSON text for suspected groups. rule_counter counts the rule_id of the
+    matched and suspected rows as they are read.
+    """
+    if category == 'suspected':
+        header = ["source_index", "source_record", "targets"]
+
+        def rows():
+            for group in results.iter_entries(category):
+                if rule_counter is not None and group.get('rule_id') is not None:
+                    rule_counter[group['rule_id']] += 1
+                yield [
+                    group.get('source_index'),
+                    json.dumps(group.get('source_record'), ensure_ascii=False),
+                    json.dumps(group.get('targets'), ensure_ascii=False)
+                ]
+        return header, rows()
+    header = results.columns(category)
+
+    def rows():
+        for entry in results.iter_entries(category):
+            if rule_counter is not None and entry.get('rule_id') is not None:
+                rule_counter[entry['rule_id']] += 1
+            yield [_cell_value(entry.get(column)) for column in header]
+    return header, rows()
+
+
+def _entries_sheet(wb, name, results, category, rule_counter=None):
+    """A sheet with one row per entry of a category and one column per entry key."""
+    ws = wb.create_sheet(title=name)
+    columns, rows = result_table(results, category, rule_counter)
+    if not columns:
+        ws.append(["No data available"])
+        return
+    header_row = [_styled(ws, column, HEADER_FONT, HEADER_FILL if col_idx % 2 == 1 else ALT_FILL, CENTER)
+                  for col_idx, column in enumerate(columns, 1)]
+    _append_table(ws, columns, header_row, rows)
+
+
+def _suspected_sheet(wb, results, rule_counter):
+    """Suspected groups as one row per group, with the record and targets as JSON text."""
+    ws = wb.create_sheet(title="Suspected")
+    header, rows = result_table(results, 'suspected', rule_counter)
+    _append_table(ws, header, header, rows)
+
+
+def report_data(batch_id, batch_info, summary):
+    """Rows of the report's Batch Summary from a batch summary (see batch_summary.result_counts)."""
+    return [
+        ["Batch ID", batch_id],
+        ["Batch Name", batch_info.get('batch_name', '')],
+        ["Total Source Records", summary['total_source']],
+        ["Total Target Records", summary['total_target']],
+        ["Matched Records", summary['matched']],
+        ["Suspected Records", summary['suspected']],
+        ["Unmatched Source Records", summary['unmatched_source']],
+        ["Unmatched Target Records", summary['unmatched_target']],
+        ["Match Rate (%)", summary['match_rate']],
+        ["Suspected Rate (%)", summary['suspected_rate']],
+        ["Unmatched Source Rate (%)", summary['unmatched_source_rate']],
+        ["Unmatched Target Rate (%)", summary['unmatched_target_rate']],
+    ]
+
+
+def rule_insights(rule_counter):
+    """Rule Insights metrics of the rule_id counts of the matched and suspected rows."""
+    most_common_rule = rule_counter.most_common(1)[0] if rule_counter else (None, 0)
+    return [
+        ("Unique Rules Applied", len(rule_counter)),
+        ("Most Frequent Rule", str(most_common_rule[0]) if most_common_rule[0] else "-"),
+        ("Most Frequent Rule Count", most_common_rule[1]),
+    ]
+
+
+def _fill_report(ws, summary, rule_counter):
+    """The Report sheet: batch summary, match distribution pie chart and rule insights."""
+    ws.column_dimensions['A'].width = 28
+    ws.column_dimensions['B'].width = 20
+    # Blank row, then the Batch Summary title in row 2 and the summary table from row 3
+    ws.append([])
+    ws.append([_styled(ws, "Batch Summary", TITLE_FONT, HEADER_FILL, CENTER)])
+    ws.merged_cells.add("A2:B2")
+    for k, v in summary:
+        ws.append([_styled(ws, k, HEADER_FONT, HEADER_FILL, LEFT), _styled(ws, v, VALUE_FONT, NO_FILL, LEFT)])
+
+    # Match distribution of the matched/suspected/unmatched counts (rows 7 to 10)
+    pie_chart = PieChart()
+    pie_chart.title = "Match Distribution"
+    pie_data = Reference(ws, min_col=2, min_row=7, max_row=10)
+    pie_labels = Reference(ws, min_col=1, min_row=7, max_row=10)
+    pie_chart.add_data(pie_data, titles_from_data=False)
+    pie_chart.set_categories(pie_labels)
+    ws.add_chart(pie_chart, "D6")
+
+    # Rule Insights section after the summary table
+    rule_start_row = len(summary) + 5
+    for _ in range(rule_start_row - len(summary) - 3):
+        ws.append([])
+    ws.append([_styled(ws, "Rule Insights", TITLE_FONT, HEADER_FILL, CENTER)])
+    ws.merged_cells.add(f"A{rule_start_row}:B{rule_start_row}")
+    for k, v in rule_insights(rule_counter):
+        ws.append([_styled(ws, k, HEADER_FONT, HEADER_FILL), _styled(ws, v, VALUE_FONT, NO_FILL)])
+
+
+def report_summary(batch_info, results):
+    """
+    (summary, rule_counter, counting) for a batch's report. The summary stored when the
+    batch was matched answers without reading the results; for older batches the
+    counts come from the result store and counting is True: rule_counter is empty and
+    counts the rules of the matched rows as they are exported.
+    """
+    summary = stored_summary(batch_info)
+    if summary is not None:
+        return summary, matched_rule_counter(summary), False
+    return result_counts({category: results.count(category) for category in CATEGORIES}), collections.Counter(), True
+
+
+def write_results_workbook(path, batch_id, batch_info, results):
+    """
+    Write the Excel report of a batch to path: a Report sheet plus one sheet per result
+    category. results is the batch's open_results() store; its entries are streamed
+    into a write-only workbook, so neither the entries nor the cells are held in memory.
+    """
+    summary, rule_counter, counting = report_summary(batch_info, results)
+    wb = Workbook(write_only=True)
+    # First sheet of the workbook, filled in once the rules of the entries are counted
+    ws_report = wb.create_sheet(title="Report")
+    _entries_sheet(wb, "Matched", results, 'matched', rule_counter if counting else None)
+    _suspected_sheet(wb, results, rule_counter if counting else None)
+    _entries_sheet(wb, "Unmatched_Source", results, 'unmatched_source')
+    _entries_sheet(wb, "Unmatched_Target", results, 'unmatched_target')
+    _fill_report(ws_report, report_data(batch_id, batch_info, summary), rule_counter)
+    wb.save(path)
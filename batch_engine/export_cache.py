@@ -0,0 +1,110 @@
+import hashlib
+import json
+import os
+import threading
+
+from batch_engine.excel_export import EXPORT_LAYOUT_VERSION
+from batch_engine.result_store import CATEGORIES, MANIFEST_NAME
+
+EXPORT_CACHE_PATH = os.path.abspath(os.path.join(os.path.dirname(os.path.dirname(__file__)), 'db_jsons', 'export_cache.json'))
+
+_cache_lock = threading.Lock()
+
+
+def _read_cache():
+    if not os.path.exists(EXPORT_CACHE_PATH):
+        return {}
+    try:
+        with open(EXPORT_CACHE_PATH, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception:
+        return {}
+
+
+def _write_cache(cache):
+    with open(EXPORT_CACHE_PATH, 'w', encoding='utf-8') as f:
+        json.dump(cache, f, indent=4)
+
+
+def _result_paths(batch_info):
+    """Every file the export of a batch reads: the four result files, plus the manifest and records of the compact layout."""
+    paths = [batch_info[f'{category}_data']['file_path'] for category in CATEGORIES]
+    batch_dir = batch_info.get('batch_dir')
+    if batch_dir and os.path.exists(os.path.join(batch_dir, MANIFEST_NAME)):
+        paths += [os.path.join(batch_dir, name) for name in (MANIFEST_NAME, 'source_records.jsonl', 'target_records.jsonl')]
+    return paths
+
+
+def _stats(paths):
+    stats = {}
+    for path in paths:
+        if os.path.exists(path):
+            st = os.stat(path)
+            stats[path] = [st.st_size, st.st_mtime_ns]
+        else:
+            stats[path] = None
+    return stats
+
+
+def _content_digest(batch_info, paths):
+    digest = hashlib.sha256()
+    digest.update(json.dumps([EXPORT_LAYOUT_VERSION, batch_info.get('batch_id'), batch_info.get('batch_name')]).encode('utf-8'))
+    for path in paths:
+        digest.update(path.encode('utf-8') + b'\0')
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                for block in iter(lambda: f.read(1024 * 1024), b''):
+                    digest.update(block)
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+class ExportFingerprint:
+    """
+    Content hash of everything a batch's export is built from (its result files, batch
+    name and the report layout version). Files whose size and mtime are unchanged since
+    the cached export are not read again.
+    """
+    def __init__(self, batch_info, cached=None):
+        paths = _result_paths(batch_info)
+        self.stats = _stats(paths)
+        if (cached and cached.get('layout_version') == EXPORT_LAYOUT_VERSION
+                and cached.get('batch_name') == batch_info.get('batch_name') and cached.get('stats') == self.stats):
+            self.digest = cached['digest']
+        else:
+            self.digest = _content_digest(batch_info, paths)
+
+
+def cached_export(batch_info, export_format, sink):
+    """
+    (file_link, fingerprint) of a batch's export in export_format: file_link is the link
+    of a previous export of the same results to the same sink, or None when it has to
+    be produced.
+    """
+    batch_id = batch_info.get('batch_id')
+    with _cache_lock:
+        cached = _read_cache().get(batch_id, {}).get(export_format)
+    fingerprint = ExportFingerprint(batch_info, cached)
+    if (cached and cached['digest'] == fingerprint.digest and cached.get('sink') == sink.cache_key
+            and sink.available(cached['file_link'])):
+        if cached['stats'] != fingerprint.stats:
+            # Same content under new mtimes: skip hashing it on the next request
+            remember_export(batch_info, export_format, sink, fingerprint, cached['file_name'], cached['file_link'])
+        return cached['file_link'], fingerprint
+    return None, fingerprint
+
+
+def remember_export(batch_info, export_format, sink, fingerprint, file_name, file_link):
+    """Keep the link of a batch's export for cached_export, replacing its previous export in that format."""
+    with _cache_lock:
+        cache = _read_cache()
+        cache.setdefault(batch_info.get('batch_id'), {})[export_format] = {
+            'digest': fingerprint.digest,
+            'stats': fingerprint.stats,
+            'layout_version': EXPORT_LAYOUT_VERSION,
+            'batch_name': batch_info.get('batch_name'),
+            'sink': sink.cache_key,
+            'file_name': file_name,
+            'file_link': file_link
+        }
+        _write_cache(cache)
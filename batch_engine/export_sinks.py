@@ -0,0 +1,176 @@
+import os
+import pickle
+import shutil
+import threading
+from pathlib import Path
+from urllib.parse import urlparse
+from urllib.request import url2pathname
+
+from google.auth.transport.requests import Request
+from google_auth_oauthlib.flow import InstalledAppFlow
+from googleapiclient.discovery import build
+from googleapiclient.http import MediaIoBaseUpload
+
+PROJECT_DIR = os.path.abspath(os.path.dirname(os.path.dirname(__file__)))
+
+# Where exports go, configurable through EXPORT_SINK: 'drive' (Google Drive, the
+# default) or 'local' (a directory, EXPORT_LOCAL_DIR, for offline use and testing).
+DEFAULT_EXPORT_SINK = 'drive'
+DEFAULT_EXPORT_LOCAL_DIR = os.path.join(PROJECT_DIR, 'exports')
+
+DRIVE_SCOPES = ['https://www.googleapis.com/auth/drive.file']
+DRIVE_CREDENTIALS_PATH = os.path.join(PROJECT_DIR, 'credentials.json')
+DRIVE_TOKEN_PATH = os.path.join(PROJECT_DIR, 'token.pickle')
+DRIVE_FOLDER_NAME = 'Cross source linker - Exports'
+DRIVE_FILE_LINK = "https://drive.google.com/file/d/{file_id}/view?usp=sharing"
+# Uploads are resumable and sent in chunks (a multiple of 256 KB) so a failed request
+# only resends its own chunk; each chunk is retried with backoff this many times.
+DRIVE_UPLOAD_CHUNK_BYTES = 8 * 1024 * 1024
+DRIVE_UPLOAD_RETRIES = 5
+
+_sink_lock = threading.Lock()
+_sink = None
+
+
+class LocalSink:
+    """Copies exports into a directory and links to them with a file:// URI."""
+    def __init__(self, directory):
+        self.directory = directory
+        self.cache_key = f"local:{os.path.abspath(directory)}"
+
+    def available(self, file_link):
+        """Whether a previously returned link still points at an export."""
+        return file_link.startswith('file://') and os.path.exists(url2pathname(urlparse(file_link).path))
+
+    def store(self, path, file_name, mimetype):
+        os.makedirs(self.directory, exist_ok=True)
+        destination = os.path.join(self.directory, file_name)
+        shutil.copyfile(path, destination)
+        print(f"[DEBUG] Export stored at {destination}")
+        return Path(destination).resolve().as_uri()
+
+
+class DriveSink:
+    """
+    Uploads exports to the exports folder on Google Drive and shares them by link.
+    The Drive client and the folder id are looked up once per process.
+    """
+    cache_key = 'drive'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._service = None
+        self._folder_id = None
+
+    def _stored_credentials(self):
+        """The saved token, or None when there is none or it cannot be read."""
+        if not os.path.exists(DRIVE_TOKEN_PATH):
+            return None
+        try:
+            with open(DRIVE_TOKEN_PATH, 'rb') as token:
+                return pickle.load(token)
+        except Exception as e:
+            print(f"[DEBUG] Could not read Drive token {DRIVE_TOKEN_PATH}: {e}")
+            return None
+
+    def _credentials(self):
+        creds = self._stored_credentials()
+        # If no valid creds, do OAuth flow
+        if not creds or not creds.valid:
+            if creds and creds.expired and creds.refresh_token:
+                creds.refresh(Request())
+            else:
+                flow = InstalledAppFlow.from_client_secrets_file(DRIVE_CREDENTIALS_PATH, DRIVE_SCOPES)
+                creds = flow.run_local_server(port=0)
+            # Save the credentials for next run
+            with open(DRIVE_TOKEN_PATH, 'wb') as token:
+                pickle.dump(creds, token)
+        return creds
+
+    def _folder(self):
+        """The Drive client and the id of the exports folder, created if missing."""
+        with self._lock:
+            if self._service is None:
+                self._service = build('drive', 'v3', credentials=self._credentials())
+            if self._folder_id is None:
+                results = self._service.files().list(
+                    q=f"mimeType='application/vnd.google-apps.folder' and name='{DRIVE_FOLDER_NAME}' and trashed=false",
+                    fields="files(id, name)").execute()
+                folders = results.get('files', [])
+                if folders:
+                    self._folder_id = folders[0]['id']
+                else:
+                    file_metadata_folder = {
+                        'name': DRIVE_FOLDER_NAME,
+                        'mimeType': 'application/vnd.google-apps.folder'
+                    }
+                    folder = self._service.files().create(body=file_metadata_folder, fields='id').execute()
+                    self._folder_id = folder.get('id')
+            return self._service, self._folder_id
+
+    def available(self, file_link):
+        """
+        Whether a previously returned link still points at an export: the saved
+        credentials are valid (or can be refreshed) and the file is on Drive, not trashed.
+        """
+        creds = self._stored_credentials()
+        if not creds or not (creds.valid or (creds.expired and creds.refresh_token)):
+            return False
+        prefix, suffix = DRIVE_FILE_LINK.split('{file_id}')
+        if not (file_link.startswith(prefix) and file_link.endswith(suffix)):
+            return False
+        file_id = file_link[len(prefix):-len(suffix)]
+        try:
+            drive_service, _ = self._folder()
+            metadata = drive_service.files().get(fileId=file_id, fields='id, trashed').execute()
+        except Exception as e:
+            print(f"[DEBUG] Cached Drive export {file_id} unavailable: {e}")
+            return False
+        return not metadata.get('trashed')
+
+    def _forget(self):
+        # A revoked token or a deleted folder: look both up again on the next export
+        with self._lock:
+            self._service = None
+            self._folder_id = None
+
+    def store(self, path, file_name, mimetype):
+        drive_service, folder_id = self._folder()
+        file_metadata = {'name': file_name, 'parents': [folder_id]}
+        try:
+            with open(path, 'rb') as f:
+                media = MediaIoBaseUpload(f, mimetype=mimetype, chunksize=DRIVE_UPLOAD_CHUNK_BYTES, resumable=True)
+                upload = drive_service.files().create(body=file_metadata, media_body=media, fields='id')
+                uploaded = None
+                while uploaded is None:
+                    # Resumes from the last chunk Drive acknowledged
+                    status, uploaded = upload.next_chunk(num_retries=DRIVE_UPLOAD_RETRIES)
+                    if status:
+                        print(f"[DEBUG] Uploading {file_name}: {int(status.progress() * 100)}%")
+            file_id = uploaded.get('id')
+            if not file_id:
+                raise RuntimeError(f"Drive returned no file id for {file_name}")
+            # Make file shareable (anyone with link can view)
+            drive_service.permissions().create(
+                fileId=file_id,
+                body={"role": "reader", "type": "anyone"},
+            ).execute()
+        except Exception:
+            self._forget()
+            raise
+        return DRIVE_FILE_LINK.format(file_id=file_id)
+
+
+def export_sink():
+    """The export sink selected by EXPORT_SINK, created once per process."""
+    global _sink
+    with _sink_lock:
+        if _sink is None:
+            kind = os.environ.get('EXPORT_SINK', DEFAULT_EXPORT_SINK).lower()
+            if kind == 'local':
+                _sink = LocalSink(os.environ.get('EXPORT_LOCAL_DIR', DEFAULT_EXPORT_LOCAL_DIR))
+            elif kind == 'drive':
+                _sink = DriveSink()
+            else:
+                raise ValueError(f"Unknown EXPORT_SINK '{kind}', expected 'drive' or 'local'")
+        return _sink
@@ -0,0 +1,84 @@
+import math
+from collections import Counter, defaultdict
+
+from batch_engine.keys import match_key
+
+# A "Fuzzy" rule's code_block may accept pairs of any trigram similarity (e.g. an edit
+# distance or difflib ratio on short values), so pairs are only blocked when the rule
+# sets options.threshold: the trigram Jaccard similarity its code_block never accepts
+# a pair below. Without it every pair is evaluated.
+GRAM_SIZE = 3
+
+
+def char_grams(key):
+    padded = ' ' * (GRAM_SIZE - 1) + key + ' '
+    return frozenset(padded[i:i + GRAM_SIZE] for i in range(len(padded) - GRAM_SIZE + 1))
+
+
+def fuzzy_threshold(options):
+    """The rule's blocking threshold, or None when it has none (or an unusable one)."""
+    threshold = (options or {}).get('threshold')
+    if threshold is None or isinstance(threshold, bool):
+        return None
+    try:
+        threshold = float(threshold)
+    except (TypeError, ValueError):
+        return None
+    if not math.isfinite(threshold) or threshold <= 0:
+        return None
+    return min(threshold, 1.0)
+
+
+class FuzzyIndex:
+    """
+    Candidate pairs for "Fuzzy" rules: pairs whose normalized values have a character
+    trigram Jaccard similarity of at least the rule's options.threshold (no blocking
+    without one). Uses prefix filtering:
+    a target reaching the threshold must share one of the source's rarest
+    |A| - ceil(t*|A|) + 1 grams, so only those posting lists are probed.
+    """
+    def __init__(self, target_values, options=None):
+        self.threshold = fuzzy_threshold(options)
+        if self.threshold is None:
+            return
+        self.target_positions = defaultdict(list)
+        for tgt_pos, value in enumerate(target_values):
+            self.target_positions[match_key(value)].append(tgt_pos)
+        self.target_keys = list(self.target_positions)
+        self.target_grams = [char_grams(key) for key in self.target_keys]
+        self.postings = defaultdict(list)
+        for key_id, grams in enumerate(self.target_grams):
+            for gram in grams:
+                self.postings[gram].append(key_id)
+        self.gram_frequency = Counter({gram: len(key_ids) for gram, key_ids in self.postings.items()})
+
+    def _matching_positions(self, key):
+        grams = char_grams(key)
+        min_overlap = math.ceil(self.threshold * len(grams) - 1e-9)
+        probe = sorted(grams, key=lambda gram: (self.gram_frequency[gram], gram))[:len(grams) - min_overlap + 1]
+        key_ids = set()
+        for gram in probe:
+            key_ids.update(self.postings.get(gram, ()))
+        tgt_positions = []
+        for key_id in key_ids:
+            target_grams = self.target_grams[key_id]
+            overlap = len(grams & target_grams)
+            if overlap / (len(grams) + len(target_grams) - overlap) >= self.threshold:
+                tgt_positions.extend(self.target_positions[self.target_keys[key_id]])
+        tgt_positions.sort()
+        return tgt_positions
+
+    def candidates(self, source_values):
+        # Without a threshold every pair is evaluated
+        if self.threshold is None:
+            return None
+        matches_by_key = {}
+        candidates = {}
+        for src_pos, value in enumerate(source_values):
+            key = match_key(value)
+            tgt_positions = matches_by_key.get(key)
+            if tgt_positions is None:
+                tgt_positions = matches_by_key[key] = self._matching_positions(key)
+            if tgt_positions:
+                candidates[src_pos] = tgt_positions
+        return candidates
@@ -0,0 +1,29 @@
+from collections import defaultdict
+
+from batch_engine.keys import match_key
+
+
+def build_hash_index(values):
+    index = defaultdict(list)
+    for pos, value in enumerate(values):
+        index[match_key(value)].append(pos)
+    return index
+
+
+class HashJoinIndex:
+    """
+    Candidate pairs for "Exact" and "Case-Insensitive" rules: a hash index over the
+    target field, built once and probed once per source value, i.e. O(S+T) instead of O(S*T).
+    """
+    key_blocked = True
+
+    def __init__(self, target_values, options=None):
+        self.index = build_hash_index(target_values)
+
+    def candidates(self, source_values):
+        candidates = {}
+        for src_pos, value in enumerate(source_values):
+            tgt_positions = self.index.get(match_key(value))
+            if tgt_positions:
+                candidates[src_pos] = tgt_positions
+        return candidates
@@ -0,0 +1,79 @@
+import hashlib
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+# Uploaded source/target files are parsed once per content: the typed DataFrame is
+# cached as Parquet (memory-mapped on read) under its content hash, in a directory the
+# server owns (INGEST_CACHE_DIR) rather than next to the uploads, so an upload can
+# never stand in for a cache file.
+DEFAULT_INGEST_CACHE_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.dirname(__file__)), 'ingest_cache'))
+INGEST_PREFIX = '.ingest_'
+INGEST_EXTENSION = '.parquet'
+UPLOAD_EXTENSIONS = ('.csv', '.xls', '.xlsx')
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def ingest_cache_dir():
+    return os.environ.get('INGEST_CACHE_DIR', DEFAULT_INGEST_CACHE_DIR)
+
+
+def is_upload(file_name):
+    return file_name.lower().endswith(UPLOAD_EXTENSIONS)
+
+
+def content_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def read_upload(path):
+    if path.endswith('.csv'):
+        return pd.read_csv(path)
+    if path.endswith('.xls') or path.endswith('.xlsx'):
+        return pd.read_excel(path)
+    raise ValueError('Unsupported file type. Only CSV and Excel are supported.')
+
+
+def _read_ingested(cache_path):
+    df = pd.read_parquet(cache_path, memory_map=True)
+    # Parquet brings missing text values back as None; uploads parse them as NaN
+    for column in df.columns[df.dtypes == object]:
+        df[column] = df[column].where(df[column].notna(), np.nan)
+    return df
+
+
+def _write_ingested(df, cache_path):
+    temp_path = f'{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    try:
+        df.to_parquet(temp_path)
+        os.replace(temp_path, cache_path)
+    except Exception as e:
+        # Caching is an optimization only; e.g. Parquet rejects non-string column names
+        print(f"[DEBUG] Could not cache ingested file {cache_path}: {e}")
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def load_upload(path):
+    """
+    DataFrame of an uploaded CSV/Excel file. The first load parses the file and caches
+    it in the ingestion cache under its content hash; later loads of the same content,
+    from any batch, read the cache instead.
+    """
+    cache_dir = ingest_cache_dir()
+    cache_path = os.path.join(cache_dir, f'{INGEST_PREFIX}{content_hash(path)}{INGEST_EXTENSION}')
+    if os.path.exists(cache_path):
+        try:
+            return _read_ingested(cache_path)
+        except Exception as e:
+            print(f"[DEBUG] Ignoring unreadable ingestion cache {cache_path}: {e}")
+    df = read_upload(path)
+    os.makedirs(cache_dir, exist_ok=True)
+    _write_ingested(df, cache_path)
+    return df
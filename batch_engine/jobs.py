@@ -0,0 +1,156 @@
+import os
+import json
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+JOB_DATA_PATH = os.path.abspath(os.path.join(os.path.dirname(os.path.dirname(__file__)), 'db_jsons', 'job_data.json'))
+
+# Background threads running batch jobs, configurable through BATCH_JOB_WORKERS.
+# One worker runs batches one after another.
+DEFAULT_JOB_WORKERS = 1
+
+_job_lock = threading.Lock()
+_executor = None
+
+
+def _now():
+    return datetime.now().isoformat(timespec='seconds')
+
+
+def _read_jobs():
+    if not os.path.exists(JOB_DATA_PATH):
+        return []
+    try:
+        with open(JOB_DATA_PATH, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception:
+        return []
+
+
+def _write_jobs(jobs):
+    with open(JOB_DATA_PATH, 'w', encoding='utf-8') as f:
+        json.dump(jobs, f, indent=4)
+
+
+def _update_job(job_id, **fields):
+    with _job_lock:
+        jobs = _read_jobs()
+        for job in jobs:
+            if job.get('job_id') == job_id:
+                job.update(fields)
+                break
+        _write_jobs(jobs)
+
+
+def get_job(job_id):
+    with _job_lock:
+        return next((job for job in _read_jobs() if job.get('job_id') == job_id), None)
+
+
+def _get_executor():
+    global _executor
+    with _job_lock:
+        if _executor is None:
+            try:
+                workers = max(1, int(os.environ.get('BATCH_JOB_WORKERS', DEFAULT_JOB_WORKERS)))
+            except ValueError:
+                workers = DEFAULT_JOB_WORKERS
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='batch_job')
+        return _executor
+
+
+def fail_interrupted_jobs():
+    """
+    Mark jobs left queued/running by a previous process as failed; they will never
+    finish. Called once at startup, before any job is submitted.
+    """
+    with _job_lock:
+        jobs = _read_jobs()
+        interrupted = [job for job in jobs if job.get('status') in ('QUEUED', 'RUNNING')]
+        for job in interrupted:
+            job['status'] = 'FAILED'
+            job['message'] = 'Interrupted by a server restart.'
+            job['finished_at'] = _now()
+        if interrupted:
+            _write_jobs(jobs)
+    return len(interrupted)
+
+
+class JobTracker:
+    """
+    Handed to a running job so it can report its current stage and percentage progress.
+    Every stage change records how long the previous stage took in stage_timings.
+    """
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self.stage_timings = {}
+        self._stage = None
+        self._stage_started = None
+        self._last_progress = None
+
+    def _close_stage(self):
+        if self._stage is not None:
+            self.stage_timings[self._stage] = round(time.monotonic() - self._stage_started, 3)
+
+    def stage(self, name, progress):
+        self._close_stage()
+        self._stage = name
+        self._stage_started = time.monotonic()
+        self._last_progress = progress
+        _update_job(self.job_id, stage=name, progress=progress, stage_timings=dict(self.stage_timings))
+
+    def progress(self, progress):
+        progress = round(progress, 1)
+        # Skip the disk write when the rounded value has not moved
+        if progress != self._last_progress:
+            self._last_progress = progress
+            _update_job(self.job_id, progress=progress)
+
+    def finish(self):
+        self._close_stage()
+        self._stage = None
+        return dict(self.stage_timings)
+
+
+def _run_job(job_id, func, args):
+    tracker = JobTracker(job_id)
+    _update_job(job_id, status='RUNNING', started_at=_now())
+    try:
+        result = func(tracker, *args)
+        _update_job(job_id, status='COMPLETED', progress=100, stage=None, result=result,
+                    stage_timings=tracker.finish(), finished_at=_now(), message='Batch job completed.')
+    except Exception as e:
+        print(f"[ERROR] Batch job {job_id} failed: {e}")
+        _update_job(job_id, status='FAILED', stage_timings=tracker.finish(), finished_at=_now(), message=str(e))
+
+
+def submit_job(job_type, batch_name, func, *args):
+    """
+    Queue func(tracker, *args) on the background job pool and return the new job's id
+    straight away. The job and its progress are persisted in job_data.json.
+    """
+    executor = _get_executor()
+    job_id = uuid.uuid4().hex
+    job = {
+        'job_id': job_id,
+        'job_type': job_type,
+        'batch_name': batch_name,
+        'status': 'QUEUED',
+        'stage': None,
+        'progress': 0,
+        'stage_timings': {},
+        'created_at': _now(),
+        'started_at': None,
+        'finished_at': None,
+        'message': 'Batch job queued.',
+        'result': None
+    }
+    with _job_lock:
+        jobs = _read_jobs()
+        jobs.append(job)
+        _write_jobs(jobs)
+    executor.submit(_run_job, job_id, func, args)
+    return job_id
@@ -0,0 +1,34 @@
+import math
+import numbers
+
+
+def key_blocking(rule):
+    """
+    Whether a rule's candidate pairs may be blocked on match_key. A rule without a
+    code_block compares values with plain equality, which is never looser than the key,
+    so it is blocked unless its options set blocking to false. A generated code_block
+    may compare more loosely than its match_type suggests (e.g. an "Exact" rule that
+    strips a prefix), so such rules are only blocked when their options set blocking
+    to true. Declarative rules never reach the indexes, they are joined on their own keys.
+    """
+    blocking = (rule.get('options') or {}).get('blocking')
+    if isinstance(blocking, bool):
+        return blocking
+    return not rule.get('code_block')
+
+
+def match_key(value):
+    """
+    Normalized string key used to block candidate pairs before a rule's code_block runs.
+    Case and all whitespace are folded away and integral numbers lose their '.0', which
+    covers the normalization usual code_blocks make (e.g. the Email Match rule strips
+    spaces and lower-cases). The code_block still decides the final match.
+    """
+    if isinstance(value, numbers.Number) and not isinstance(value, complex):
+        try:
+            number = float(value)
+        except (TypeError, ValueError):
+            number = None
+        if number is not None and math.isfinite(number) and number.is_integer():
+            value = int(number)
+    return ''.join(str(value).split()).casefold()
@@ -0,0 +1,49 @@
+from batch_engine.date_index import DateRangeIndex
+from batch_engine.fuzzy_index import FuzzyIndex
+from batch_engine.hash_index import HashJoinIndex
+from batch_engine.keys import key_blocking
+from batch_engine.sorted_index import PrefixIndex, SuffixIndex
+from batch_engine.substring_index import SubstringIndex
+
+# Candidate indexes per match_type. Each is built once from the target field values
+# (in row order) plus the rule's options, and its candidates(source_values) returns
+# {source position: [target positions]}; only those pairs are handed to the rule's
+# code_block. Match types without an entry, or whose index returns None, are
+# evaluated on every pair. Indexes with key_blocked set prune on match_key and are
+# only used for rules key_blocking allows.
+CANDIDATE_INDEXES = {
+    "Exact": HashJoinIndex,
+    "Case-Insensitive": HashJoinIndex,
+    "Prefix": PrefixIndex,
+    "Suffix": SuffixIndex,
+    "Contains/Substr": SubstringIndex,
+    "Fuzzy": FuzzyIndex,
+    "Date Range": DateRangeIndex,
+}
+
+
+
+def register_candidate_index(match_type, index_class):
+    """
+    Plug a candidate index in for a match_type (replacing any existing one). index_class
+    is built as index_class(target_values, options) and must provide candidates(source_values).
+    """
+    CANDIDATE_INDEXES[match_type] = index_class
+
+
+def candidate_targets(rule, df_source, df_target, target_indexes=None):
+    """
+    Return {source position: [target positions]} worth evaluating for the rule,
+    or None when the rule's match_type has no index and every pair must be checked.
+    Passing the same target_indexes dict for several source frames against one target
+    frame (e.g. source chunks) builds each rule's target index only once.
+    """
+    index_class = CANDIDATE_INDEXES.get(rule.get('match_type'))
+    if index_class is None or (getattr(index_class, 'key_blocked', False) and not key_blocking(rule)):
+        return None
+    index = target_indexes.get(rule.get('rule_id')) if target_indexes is not None else None
+    if index is None:
+        index = index_class(df_target[rule['target_field']].tolist(), rule.get('options') or {})
+        if target_indexes is not None:
+            target_indexes[rule.get('rule_id')] = index
+    return index.candidates(df_source[rule['source_field']].tolist())
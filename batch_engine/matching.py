@@ -0,0 +1,172 @@
+from batch_engine.matchers import candidate_targets
+from batch_engine.numeric_combinations import find_combinations
+from batch_engine.pair_evaluation import evaluate_rule, evaluate_rules, match_workers
+from batch_engine.rule_compiler import CompiledRule
+from batch_engine.scoring import PairScores, is_decisive, is_tie_breaker, priority_order, rule_weight
+from batch_engine.vectorized import declarative_matches, is_declarative
+
+
+def is_pair_rule(rule):
+    """Rules checked pair by pair through their code_block (the others evaluate whole columns)."""
+    return not is_declarative(rule) and rule.get('match_type') != 'Numeric Combinations'
+
+
+def column_rule_hits(rule, df_source, df_target):
+    """Hits of a declarative or Numeric Combinations rule as (src_pos, tgt_pos, combination)."""
+    if is_declarative(rule):
+        # Built-in operator evaluated as a vectorized join; every returned pair is a match
+        return [(src_pos, tgt_pos, None) for src_pos, tgt_pos in declarative_matches(rule, df_source, df_target)]
+    # One source amount against sums of several target amounts; no per-pair code_block
+    return [
+        (src_pos, tgt_pos, combination)
+        for src_pos, combinations in find_combinations(rule, df_source, df_target).items()
+        for combination in combinations
+        for tgt_pos in combination
+    ]
+
+
+def _tie_breaker(rules, df_source, df_target, source_store, target_store):
+    """Tie scores for tied pairs: the summed weight of the tie-breaker rules matching each pair."""
+    def tie_scores(pairs):
+        tied = set(pairs)
+        tied_candidates = {}
+        for src_pos, tgt_pos in sorted(tied):
+            tied_candidates.setdefault(src_pos, []).append(tgt_pos)
+        scores = {}
+        for rule in rules:
+            if is_pair_rule(rule):
+                hits = evaluate_rule(CompiledRule(rule), source_store, target_store, tied_candidates)
+            else:
+                hits = {(src_pos, tgt_pos) for src_pos, tgt_pos, _ in column_rule_hits(rule, df_source, df_target)} & tied
+            for pair in hits:
+                scores[pair] = scores.get(pair, 0) + rule_weight(rule)
+        print(f"[DEBUG] Tie-breaker rules scored {len(scores)} of {len(tied)} tied pairs")
+        return scores
+    return tie_scores
+
+
+def _recorded_pair_hits(rule, rank, hits, skipped, decided, df_source, df_target, source_store, target_store,
+                        target_indexes):
+    """
+    Hits of an unchanged pair rule: the ones recorded by an earlier run, plus its hits
+    on the pairs that run skipped and that no decisive rule ranked before it decides now.
+    """
+    missing = sorted(pair for pair in skipped if decided.get(pair, rank) >= rank)
+    if not missing:
+        return hits
+    candidates = candidate_targets(rule, df_source, df_target, target_indexes)
+    candidate_sets = {}
+    to_evaluate = {}
+    for src_pos, tgt_pos in missing:
+        if candidates is not None:
+            if src_pos not in candidate_sets:
+                candidate_sets[src_pos] = set(candidates.get(src_pos, ()))
+            if tgt_pos not in candidate_sets[src_pos]:
+                continue
+        to_evaluate.setdefault(src_pos, []).append(tgt_pos)
+    pairs = evaluate_rule(CompiledRule(rule), source_store, target_store, to_evaluate)
+    evaluated = sum(len(tgt_positions) for tgt_positions in to_evaluate.values())
+    print(f"[DEBUG] Rule {rule.get('rule_id')}: reused recorded hits, evaluated {evaluated} previously skipped pairs")
+    return sorted(set(hits) | {(src_pos, tgt_pos, None) for src_pos, tgt_pos in pairs})
+
+
+def count_blocking(blocking, rule, evaluated, total_pairs):
+    """Add the pairs a rule's candidate index handed over and pruned to blocking, {rule_id: counts}."""
+    counts = blocking.setdefault(rule.get('rule_id'), {'rule_id': rule.get('rule_id'), 'match_type': rule.get('match_type'),
+                                                       'evaluated_pairs': 0, 'pruned_pairs': 0})
+    counts['evaluated_pairs'] += evaluated
+    counts['pruned_pairs'] += total_pairs - evaluated
+
+
+def match_records(rules, df_source, df_target, source_store, target_store, tracker=None, target_indexes=None,
+                  previous=None, rule_hits=None, blocking=None):
+    """
+    Run the active rules over the batch and return the kept matches as
+    (src_pos, tgt_pos, state) in pair order, state holding the reported rule, the pair's
+    score and its numeric combination (if any).
+
+    Rules run in priority order (weight, then rule_id): a pair stops being evaluated once
+    a decisive rule matched it, and a source with several candidates keeps the best
+    scoring ones. Tie-breaker rules never create matches; they only run on candidates
+    that are still tied. tracker, if given, gets the indexing and matching stages;
+    target_indexes is handed to candidate_targets to reuse target-side indexes.
+
+    previous, the RuleHits of an earlier run over the same files, spares re-evaluating
+    rules whose matching definition did not change; rule_hits, if given, records the
+    hits of this run. blocking, if given, adds up per rule_id the pairs candidate
+    indexes let through and pruned (see count_blocking).
+    """
+    scoring_rules = priority_order([rule for rule in rules if not is_tie_breaker(rule)])
+    tie_breaker_rules = [rule for rule in rules if is_tie_breaker(rule)]
+    recorded = {}
+    if previous is not None:
+        recorded = {rank: previous.hits(rule) for rank, rule in enumerate(scoring_rules)}
+        recorded = {rank: hits for rank, hits in recorded.items() if hits is not None}
+        print(f"[DEBUG] Reusing recorded hits of {len(recorded)} of {len(scoring_rules)} rules")
+
+    if tracker:
+        tracker.stage('indexing', 10)
+    # Column-wise rules are cheap, so they run first and tell pair rules which pairs are decided
+    hits_by_rank = {}
+    decided = {}
+    for rank, rule in enumerate(scoring_rules):
+        if not is_pair_rule(rule):
+            hits_by_rank[rank] = recorded[rank] if rank in recorded else column_rule_hits(rule, df_source, df_target)
+            if is_decisive(rule):
+                for src_pos, tgt_pos, _ in hits_by_rank[rank]:
+                    decided.setdefault((src_pos, tgt_pos), rank)
+
+    # Pair rules are evaluated together, except that a rule with recorded hits splits
+    # them: the rules after it must see the pairs it decides
+    pair_ranks = [rank for rank, rule in enumerate(scoring_rules) if is_pair_rule(rule)]
+    segments = []
+    for rank in pair_ranks:
+        if rank in recorded or not segments or segments[-1][-1] in recorded:
+            segments.append([rank])
+        else:
+            segments[-1].append(rank)
+
+    if tracker:
+        tracker.stage('matching', 20)
+    done_rules = 0
+    for segment in segments:
+        if segment[0] in recorded:
+            rank = segment[0]
+            rule = scoring_rules[rank]
+            hits_by_rank[rank] = _recorded_pair_hits(rule, rank, recorded[rank], previous.skipped_pairs(rule), decided,
+                                                     df_source, df_target, source_store, target_store, target_indexes)
+        else:
+            pair_rules = [scoring_rules[rank] for rank in segment]
+            # Indexed match types only hand their candidate pairs over
+            pair_candidates = []
+            for rule in pair_rules:
+                candidates = candidate_targets(rule, df_source, df_target, target_indexes)
+                if candidates is not None:
+                    evaluated = sum(len(tgt_positions) for tgt_positions in candidates.values())
+                    total_pairs = len(df_source) * len(df_target)
+                    print(f"[DEBUG] Rule {rule.get('rule_id')} ({rule.get('match_type')}): evaluating {evaluated} of {total_pairs} pairs, blocking pruned {total_pairs - evaluated}")
+                    if blocking is not None:
+                        count_blocking(blocking, rule, evaluated, total_pairs)
+                pair_candidates.append(candidates)
+            # Code_blocks are compiled once per process (and once per pool worker) inside evaluate_rules
+            progress = (lambda done, start=done_rules, size=len(segment):
+                        tracker.progress(20 + 50 * (start + done * size) / len(pair_ranks))) if tracker else None
+            pair_results = evaluate_rules(pair_rules, source_store, target_store, pair_candidates, match_workers(),
+                                          progress=progress, ranks=segment, decided=decided)
+            for rank, pairs in zip(segment, pair_results):
+                hits_by_rank[rank] = [(src_pos, tgt_pos, None) for src_pos, tgt_pos in pairs]
+        if len(segments) > 1:
+            for rank in segment:
+                if is_decisive(scoring_rules[rank]):
+                    for src_pos, tgt_pos, _ in hits_by_rank[rank]:
+                        if decided.get((src_pos, tgt_pos), rank) >= rank:
+                            decided[(src_pos, tgt_pos)] = rank
+        done_rules += len(segment)
+
+    scores = PairScores()
+    for rank, rule in enumerate(scoring_rules):
+        scores.add(rank, rule, hits_by_rank[rank])
+        if rule_hits is not None:
+            rule_hits.record(rule, hits_by_rank[rank])
+    tie_breaker = _tie_breaker(tie_breaker_rules, df_source, df_target, source_store, target_store) if tie_breaker_rules else None
+    return scores.settle(tie_breaker)
@@ -0,0 +1,155 @@
+import time
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+
+import pandas as pd
+
+from batch_engine.keys import match_key
+
+# Defaults for "Numeric Combinations" rules, overridable through the rule's options
+DEFAULT_MAX_COMBINATION_SIZE = 3
+DEFAULT_TIME_BUDGET_SECONDS = 0.05
+# Budget for enumerating the subset sums of one group of target amounts, spent once per group
+DEFAULT_TABLE_BUDGET_SECONDS = 1.0
+DEFAULT_MAX_SOLUTIONS = 5
+DEFAULT_DECIMALS = 2
+
+
+def _to_units(values, decimals):
+    """Amounts as integer minor units (e.g. cents) so sums compare exactly; None when not numeric."""
+    numbers = pd.to_numeric(pd.Series(values, dtype=object), errors='coerce')
+    scale = 10 ** decimals
+    return [None if pd.isna(number) else int(round(number * scale)) for number in numbers]
+
+
+def _half_sums(items, max_size, cap, deadline):
+    """
+    Every subset of `items` (sorted ascending by amount) with at most max_size members,
+    as a list of (sum, item ids) sorted by sum, and whether the deadline cut the list
+    short. With a cap (all amounts non-negative) the ascending order lets a branch stop
+    as soon as its running sum exceeds the cap.
+    """
+    sums = [(0, ())]
+    truncated = False
+
+    def extend(start, total, chosen):
+        nonlocal truncated
+        if len(chosen) == max_size:
+            return
+        if time.monotonic() > deadline:
+            truncated = True
+            return
+        for item_id in range(start, len(items)):
+            new_total = total + items[item_id][0]
+            if cap is not None and new_total > cap:
+                break
+            new_chosen = chosen + (item_id,)
+            sums.append((new_total, new_chosen))
+            extend(item_id + 1, new_total, new_chosen)
+
+    extend(0, 0, ())
+    sums.sort()
+    return sums, truncated
+
+
+class CombinationGroup:
+    """
+    Target amounts sharing one blocking key, prepared for meet-in-the-middle search:
+    the sorted amounts are split into two halves whose bounded subset sums are
+    enumerated once, then each source amount looks up its complements by bisect.
+    truncated is set when the table budget ran out before every subset sum was listed.
+    """
+    def __init__(self, items, max_size, max_amount, deadline):
+        self.items = sorted(items)
+        self.max_size = max_size
+        non_negative = all(units >= 0 for units, _ in self.items)
+        cap = max_amount if non_negative else None
+        middle = len(self.items) // 2
+        self.left, left_truncated = _half_sums(self.items[:middle], max_size, cap, deadline)
+        right, right_truncated = _half_sums(self.items[middle:], max_size, cap, deadline)
+        self.right = [(total, tuple(item_id + middle for item_id in chosen)) for total, chosen in right]
+        self.truncated = left_truncated or right_truncated
+        self.right_sums = [total for total, _ in self.right]
+        self.non_negative = non_negative
+
+    def search(self, amount, tolerance, max_solutions, deadline):
+        solutions = []
+        for step, (left_total, left_chosen) in enumerate(self.left):
+            if self.non_negative and left_total > amount + tolerance:
+                break
+            if step % 256 == 0 and time.monotonic() > deadline:
+                break
+            low = bisect_left(self.right_sums, amount - tolerance - left_total)
+            high = bisect_right(self.right_sums, amount + tolerance - left_total)
+            for _, right_chosen in self.right[low:high]:
+                size = len(left_chosen) + len(right_chosen)
+                if size == 0 or size > self.max_size:
+                    continue
+                solutions.append(tuple(sorted(self.items[item_id][1] for item_id in left_chosen + right_chosen)))
+                if len(solutions) >= max_solutions:
+                    return solutions
+        return solutions
+
+
+def _option(options, name, default, cast):
+    try:
+        return cast(options.get(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def find_combinations(rule, df_source, df_target):
+    """
+    Many-to-one matching for "Numeric Combinations" rules: for every source amount, the
+    sets of target amounts (sharing the source's blocking key, if configured) that sum
+    to it. Returns {source position: [tuple of target positions, ...]}.
+
+    Options: max_combination_size, time_budget_seconds (per source record),
+    table_budget_seconds (per group of target amounts), tolerance (in amount units),
+    decimals, max_solutions, and source_group_field/target_group_field as the blocking key.
+    """
+    options = rule.get('options') or {}
+    max_size = max(1, _option(options, 'max_combination_size', DEFAULT_MAX_COMBINATION_SIZE, int))
+    time_budget = _option(options, 'time_budget_seconds', DEFAULT_TIME_BUDGET_SECONDS, float)
+    table_budget = _option(options, 'table_budget_seconds', DEFAULT_TABLE_BUDGET_SECONDS, float)
+    max_solutions = max(1, _option(options, 'max_solutions', DEFAULT_MAX_SOLUTIONS, int))
+    decimals = _option(options, 'decimals', DEFAULT_DECIMALS, int)
+    tolerance = abs(int(round(_option(options, 'tolerance', 0, float) * 10 ** decimals)))
+
+    source_units = _to_units(df_source[rule['source_field']].tolist(), decimals)
+    target_units = _to_units(df_target[rule['target_field']].tolist(), decimals)
+    src_group_field = options.get('source_group_field')
+    tgt_group_field = options.get('target_group_field')
+    if src_group_field in df_source.columns and tgt_group_field in df_target.columns:
+        source_keys = [match_key(value) for value in df_source[src_group_field].tolist()]
+        target_keys = [match_key(value) for value in df_target[tgt_group_field].tolist()]
+    else:
+        source_keys = [None] * len(df_source)
+        target_keys = [None] * len(df_target)
+
+    group_items = defaultdict(list)
+    for tgt_pos, units in enumerate(target_units):
+        if units is not None:
+            group_items[target_keys[tgt_pos]].append((units, tgt_pos))
+    group_max_amount = defaultdict(int)
+    for src_pos, units in enumerate(source_units):
+        if units is not None:
+            key = source_keys[src_pos]
+            group_max_amount[key] = max(group_max_amount[key], units + tolerance)
+
+    groups = {}
+    combinations = {}
+    for src_pos, units in enumerate(source_units):
+        key = source_keys[src_pos]
+        if units is None or key not in group_items:
+            continue
+        if key not in groups:
+            groups[key] = CombinationGroup(group_items[key], max_size, group_max_amount[key],
+                                           time.monotonic() + table_budget)
+            if groups[key].truncated:
+                print(f"[DEBUG] Rule {rule.get('rule_id')}: subset sums of {len(group_items[key])} target amounts "
+                      f"cut short after {table_budget}s, some combinations may be missed")
+        found = groups[key].search(units, tolerance, max_solutions, time.monotonic() + time_budget)
+        if found:
+            combinations[src_pos] = found
+    return combinations
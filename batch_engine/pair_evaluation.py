@@ -0,0 +1,128 @@
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from batch_engine.rule_compiler import compile_rules
+from batch_engine.scoring import is_decisive
+
+# Worker processes for pair evaluation, configurable through BATCH_MATCH_WORKERS.
+# 1 keeps matching inside the request process.
+DEFAULT_MATCH_WORKERS = 1
+# Batches with fewer pairs to evaluate stay serial; process start-up would dominate
+MIN_PARALLEL_PAIRS = 200000
+# Several shards per worker so uneven shards still balance across the pool
+SHARDS_PER_WORKER = 4
+
+
+def match_workers():
+    try:
+        return max(1, int(os.environ.get('BATCH_MATCH_WORKERS', DEFAULT_MATCH_WORKERS)))
+    except ValueError:
+        return DEFAULT_MATCH_WORKERS
+
+
+def evaluate_rule(rule_matcher, source_store, target_store, candidates, src_start=0, src_end=None, skip=None):
+    """
+    Run a compiled rule over source rows [src_start, src_end) against their candidate
+    targets (every target when candidates is None), leaving out pairs for which
+    skip(src_pos, tgt_pos) is true. Returns the matching (source position, target
+    position) pairs in row order.
+    """
+    src_values = source_store.column(rule_matcher.src_field, src_start, src_end)
+    tgt_values = target_store.column(rule_matcher.tgt_field)
+    all_target_positions = range(len(target_store))
+    pairs = []
+    for src_pos, src_value in enumerate(src_values, src_start):
+        tgt_positions = all_target_positions if candidates is None else candidates.get(src_pos, ())
+        for tgt_pos in tgt_positions:
+            if skip is not None and skip(src_pos, tgt_pos):
+                continue
+            if rule_matcher.needs_records:
+                match = rule_matcher(src_value, tgt_values[tgt_pos], source_store.record(src_pos), target_store.record(tgt_pos))
+            else:
+                match = rule_matcher(src_value, tgt_values[tgt_pos])
+            if match:
+                pairs.append((src_pos, tgt_pos))
+    return pairs
+
+
+def _evaluate_in_priority_order(compiled_rules, source_store, target_store, candidates_by_rule, ranks, decided,
+                                src_start=0, src_end=None, progress=None):
+    """
+    Evaluate the rules one after another, skipping every pair a higher-priority decisive
+    rule already matched: either one evaluated here (decided_here) or one evaluated
+    before pair evaluation started (decided maps such pairs to that rule's rank).
+    """
+    decided_here = set()
+    results = []
+    for rule_matcher, candidates, rank in zip(compiled_rules, candidates_by_rule, ranks):
+        def skip(src_pos, tgt_pos, rank=rank):
+            pair = (src_pos, tgt_pos)
+            return pair in decided_here or decided.get(pair, rank) < rank
+        pairs = evaluate_rule(rule_matcher, source_store, target_store, candidates, src_start, src_end,
+                              skip if decided or decided_here else None)
+        if is_decisive(rule_matcher.rule):
+            decided_here.update(pairs)
+        results.append(pairs)
+        if progress:
+            progress(len(results) / len(compiled_rules))
+    return results
+
+
+# Per-process state of a pool worker: the batch's row stores, candidates and compiled rules
+_worker_state = {}
+
+
+def _init_worker(rules, source_store, target_store, candidates_by_rule, ranks, decided):
+    _worker_state['compiled_rules'] = compile_rules(rules)
+    _worker_state['source_store'] = source_store
+    _worker_state['target_store'] = target_store
+    _worker_state['candidates_by_rule'] = candidates_by_rule
+    _worker_state['ranks'] = ranks
+    _worker_state['decided'] = decided
+
+
+def _match_shard(bounds):
+    src_start, src_end = bounds
+    # A pair lives in exactly one shard, so each shard can stop early on its own pairs
+    return _evaluate_in_priority_order(_worker_state['compiled_rules'], _worker_state['source_store'],
+                                       _worker_state['target_store'], _worker_state['candidates_by_rule'],
+                                       _worker_state['ranks'], _worker_state['decided'], src_start, src_end)
+
+
+def evaluate_rules(rules, source_store, target_store, candidates_by_rule, workers=1, progress=None,
+                   ranks=None, decided=None):
+    """
+    Evaluate every rule over its candidate pairs and return one list of matching
+    (source position, target position) pairs per rule. Rules are given in priority
+    order with their ranks; once a decisive rule matched a pair, later rules skip it,
+    as they do for pairs in decided ({pair: rank of the rule that decided it}).
+    With several workers the source rows are split into contiguous shards evaluated in
+    a process pool, and shard results are concatenated in shard order, so the output
+    is identical to the serial run. progress, if given, is called with the fraction of
+    the work done so far.
+    """
+    total_pairs = sum(
+        len(source_store) * len(target_store) if candidates is None else sum(len(tgt_positions) for tgt_positions in candidates.values())
+        for candidates in candidates_by_rule
+    )
+    ranks = list(range(len(rules))) if ranks is None else ranks
+    decided = decided or {}
+    if workers <= 1 or total_pairs < MIN_PARALLEL_PAIRS or len(source_store) < 2:
+        return _evaluate_in_priority_order(compile_rules(rules), source_store, target_store, candidates_by_rule,
+                                           ranks, decided, progress=progress)
+
+    shard_size = math.ceil(len(source_store) / (workers * SHARDS_PER_WORKER))
+    bounds = [(start, min(start + shard_size, len(source_store))) for start in range(0, len(source_store), shard_size)]
+    print(f"[DEBUG] Evaluating {total_pairs} pairs in {len(bounds)} shards across {workers} worker processes")
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(rules, source_store, target_store, candidates_by_rule, ranks, decided)) as pool:
+        shard_results = []
+        for shard in pool.map(_match_shard, bounds):
+            shard_results.append(shard)
+            if progress:
+                progress(len(shard_results) / len(bounds))
+    return [
+        [pair for shard in shard_results for pair in shard[rule_pos]]
+        for rule_pos in range(len(rules))
+    ]
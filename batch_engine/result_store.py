@@ -0,0 +1,365 @@
+import os
+import json
+import math
+from array import array
+
+import numpy as np
+import pandas as pd
+
+# Result categories of a batch, in the order they are reported
+CATEGORIES = ('matched', 'suspected', 'unmatched_source', 'unmatched_target')
+RESULT_FORMAT_VERSION = 1
+MANIFEST_NAME = 'results_manifest.json'
+
+
+def json_safe(value):
+    """value with NaN and infinity replaced by null, as strict JSON readers expect."""
+    if isinstance(value, float):
+        return value if math.isfinite(value) else None
+    if isinstance(value, dict):
+        return {key: json_safe(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [json_safe(item) for item in value]
+    return value
+
+
+def _default(obj):
+    """Values the json module cannot encode on its own, converted while encoding (no copy of the data)."""
+    if obj is pd.NaT:
+        return None
+    if isinstance(obj, (pd.Timestamp, np.datetime64)):
+        return str(obj)
+    if isinstance(obj, np.integer):
+        return int(obj)
+    if isinstance(obj, np.floating):
+        return float(obj) if np.isfinite(obj) else None
+    if isinstance(obj, np.bool_):
+        return bool(obj)
+    if isinstance(obj, np.ndarray):
+        return json_safe(obj.tolist())
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def pretty_results():
+    # Set BATCH_RESULTS_PRETTY=1 to indent every stored document, for debugging only
+    return os.environ.get('BATCH_RESULTS_PRETTY', '').lower() in ('1', 'true', 'yes')
+
+
+def result_encoder(pretty=False):
+    # Floats never reach default: records have their NaN and infinities replaced by
+    # RowStore.records(), and allow_nan=False turns anything that slips through into an
+    # error rather than bare NaN
+    if pretty:
+        return json.JSONEncoder(indent=4, default=_default, allow_nan=False)
+    return json.JSONEncoder(separators=(',', ':'), default=_default, allow_nan=False)
+
+
+class _LineWriter:
+    """
+    Appends one JSON document per line (a document may span several lines in pretty
+    mode) and keeps the byte offset of each, saved next to the file on close.
+    """
+    def __init__(self, path, encoder):
+        self.path = path
+        self.encoder = encoder
+        self.file = open(path, 'wb')
+        self.offsets = array('q', [0])
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def write(self, item):
+        data = (self.encoder.encode(item) + '\n').encode('utf-8')
+        self.file.write(data)
+        self.offsets.append(self.offsets[-1] + len(data))
+
+    def close(self):
+        self.file.close()
+        np.save(_offsets_path(self.path), np.frombuffer(self.offsets, dtype=np.int64))
+
+
+def _offsets_path(path):
+    return os.path.splitext(path)[0] + '.offsets.npy'
+
+
+class _LineFile:
+    """Random access to the documents of a file written by _LineWriter."""
+    def __init__(self, path):
+        self.offsets = np.load(_offsets_path(path), mmap_mode='r')
+        self.file = open(path, 'rb')
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def read(self, line_no):
+        start, end = int(self.offsets[line_no]), int(self.offsets[line_no + 1])
+        self.file.seek(start)
+        return json.loads(self.file.read(end - start))
+
+    def close(self):
+        self.file.close()
+
+
+def _compact(entry, row_of):
+    """An entry with its records replaced by row numbers and without the embedded rule."""
+    compact = {}
+    for key, value in entry.items():
+        if key == 'source_record':
+            compact['source_row'] = row_of('source', entry['source_index'])
+        elif key == 'target_record':
+            compact['target_row'] = row_of('target', entry['target_index'])
+        elif key == 'targets':
+            compact['targets'] = [_compact(target, row_of) for target in value]
+        elif key != 'rule':
+            compact[key] = value
+    return compact
+
+
+# Entry keys of the compact layout and the keys they are expanded to
+_EXPANDED_KEYS = {'source_row': 'source_record', 'target_row': 'target_record'}
+
+
+def _add_columns(columns, keys):
+    """Add the expanded keys of a compact entry to columns, a dict used as an ordered set."""
+    for key in keys:
+        columns[_EXPANDED_KEYS.get(key, key)] = None
+        if key == 'rule_id':
+            columns['rule'] = None
+
+
+class ResultWriter:
+    """
+    Streams a batch's results into batch_dir as they are produced: every source and
+    target record once (JSON Lines plus a row-offset index), matched and suspected
+    entries referring to records by row number and to rules by rule_id, and unmatched
+    results as arrays of row numbers. Records can be added in several parts (e.g. one
+    per source chunk) as long as entries only refer to records already added.
+    close() writes the manifest, with the columns of the matched and suspected entries.
+    """
+    def __init__(self, batch_dir, pretty=None):
+        self.batch_dir = batch_dir
+        self.encoder = result_encoder(pretty_results() if pretty is None else pretty)
+        self.files = {}
+        self._writers = {
+            name: _LineWriter(os.path.join(batch_dir, f'{name}.jsonl'), self.encoder)
+            for name in ('source_records', 'target_records', 'matched', 'suspected')
+        }
+        # Row number per index label; None while every label equals its row number
+        # (the usual RangeIndex), so no per-row mapping has to be kept
+        self._rows = {'source': None, 'target': None}
+        self._unmatched = {'unmatched_source': array('q'), 'unmatched_target': array('q')}
+        # Entry keys in order of first appearance; entries mostly share one key layout,
+        # so each distinct layout is only merged in once
+        self._columns = {'matched': {}, 'suspected': {}}
+        self._layouts = {'matched': set(), 'suspected': set()}
+
+    def _row_of(self, side, label):
+        rows = self._rows[side]
+        return label if rows is None else rows[label]
+
+    def add_records(self, side, store):
+        """Append a RowStore's records to the 'source' or 'target' records file."""
+        writer = self._writers[f'{side}_records']
+        start = len(writer)
+        rows = self._rows[side]
+        if rows is None and store.index != list(range(start, start + len(store))):
+            rows = self._rows[side] = {row: row for row in range(start)}
+        for pos, record in enumerate(store.records()):
+            if rows is not None:
+                rows[store.index[pos]] = start + pos
+            writer.write(record)
+
+    def add(self, category, entry):
+        compact = _compact(entry, self._row_of)
+        layout = tuple(compact)
+        if layout not in self._layouts[category]:
+            self._layouts[category].add(layout)
+            _add_columns(self._columns[category], layout)
+        self._writers[category].write(compact)
+
+    def add_unmatched(self, category, labels):
+        side = 'source' if category == 'unmatched_source' else 'target'
+        self._unmatched[category].extend(self._row_of(side, label) for label in labels)
+
+    def close(self, rules):
+        """Finish the files and return {category: {'file_path', 'count'}} for batch_data.json."""
+        for name, writer in self._writers.items():
+            writer.close()
+            if name in CATEGORIES:
+                self.files[name] = {'file_path': writer.path, 'count': len(writer)}
+        for category, rows in self._unmatched.items():
+            path = os.path.join(self.batch_dir, f'{category}.npy')
+            np.save(path, np.frombuffer(rows, dtype=np.int64))
+            self.files[category] = {'file_path': path, 'count': len(rows)}
+        manifest = {
+            'version': RESULT_FORMAT_VERSION,
+            'counts': {category: self.files[category]['count'] for category in CATEGORIES},
+            'columns': {category: list(columns) for category, columns in self._columns.items()},
+            'rules': rules
+        }
+        with open(os.path.join(self.batch_dir, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+            f.write(self.encoder.encode(json_safe(manifest)))
+        return self.files
+
+
+def write_results(batch_dir, source_store, target_store, rules, matched, suspected, unmatched_source, unmatched_target):
+    """Store a batch's results in batch_dir with a ResultWriter; see ResultWriter for the layout."""
+    writer = ResultWriter(batch_dir)
+    writer.add_records('source', source_store)
+    writer.add_records('target', target_store)
+    for category, entries in (('matched', matched), ('suspected', suspected)):
+        for entry in entries:
+            writer.add(category, entry)
+    writer.add_unmatched('unmatched_source', unmatched_source)
+    writer.add_unmatched('unmatched_target', unmatched_target)
+    return writer.close(rules)
+
+
+def _project(record, fields):
+    if fields is None:
+        return record
+    return {field: record[field] for field in fields if field in record}
+
+
+class ResultStore:
+    """Paged reads of results written by write_results, expanded back to the full entry layout."""
+    def __init__(self, batch_dir):
+        self.batch_dir = batch_dir
+        with open(os.path.join(batch_dir, MANIFEST_NAME), 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        self.counts = manifest['counts']
+        # Manifests written before the columns were recorded have none
+        self._columns = manifest.get('columns', {})
+        self.rules = {rule.get('rule_id'): rule for rule in manifest['rules']}
+
+    def count(self, category):
+        return self.counts[category]
+
+    def _expand(self, compact, records, fields):
+        entry = {}
+        for key, value in compact.items():
+            if key == 'source_row':
+                entry['source_record'] = _project(records['source'].read(value), fields)
+            elif key == 'target_row':
+                entry['target_record'] = _project(records['target'].read(value), fields)
+            elif key == 'targets':
+                entry['targets'] = [self._expand(target, records, fields) for target in value]
+            else:
+                entry[key] = value
+                if key == 'rule_id':
+                    entry['rule'] = self.rules.get(value)
+        return entry
+
+    def iter_entries(self, category, offset=0, limit=None, fields=None):
+        """
+        Yield entries [offset, offset + limit) of a category one at a time, reading the
+        files incrementally; fields limits the record columns returned.
+        """
+        end = self.count(category) if limit is None else min(offset + limit, self.count(category))
+        if offset >= end:
+            return
+        records = {
+            'source': _LineFile(os.path.join(self.batch_dir, 'source_records.jsonl')),
+            'target': _LineFile(os.path.join(self.batch_dir, 'target_records.jsonl'))
+        }
+        try:
+            if category.startswith('unmatched_'):
+                side = records[category[len('unmatched_'):]]
+                rows = np.load(os.path.join(self.batch_dir, f'{category}.npy'), mmap_mode='r')
+                for row in rows[offset:end]:
+                    yield _project(side.read(int(row)), fields)
+                return
+            entries = _LineFile(os.path.join(self.batch_dir, f'{category}.jsonl'))
+            try:
+                for line_no in range(offset, end):
+                    yield self._expand(entries.read(line_no), records, fields)
+            finally:
+                entries.close()
+        finally:
+            for line_file in records.values():
+                line_file.close()
+
+    def read(self, category, offset=0, limit=None, fields=None):
+        """Entries [offset, offset + limit) of a category as a list."""
+        return list(self.iter_entries(category, offset, limit, fields))
+
+    def columns(self, category):
+        """
+        Keys of a category's entries in order of first appearance (the columns of a table
+        of them), as recorded in the manifest. Results stored without them are scanned
+        once, compact entries only; records are not read.
+        """
+        if self.count(category) == 0:
+            return []
+        if category.startswith('unmatched_'):
+            # Every record of a side has the same columns
+            return list(next(self.iter_entries(category, 0, 1)))
+        if category in self._columns:
+            return list(self._columns[category])
+        columns = {}
+        entries = _LineFile(os.path.join(self.batch_dir, f'{category}.jsonl'))
+        try:
+            for line_no in range(len(entries)):
+                _add_columns(columns, entries.read(line_no))
+        finally:
+            entries.close()
+        self._columns[category] = list(columns)
+        return self._columns[category]
+
+
+class LegacyResults:
+    """Batches processed before write_results: one JSON array per category."""
+    def __init__(self, batch_info):
+        self.batch_info = batch_info
+        self._loaded = {}
+
+    def _load(self, category):
+        if category not in self._loaded:
+            path = self.batch_info[f'{category}_data']['file_path']
+            data = []
+            if os.path.exists(path):
+                with open(path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            self._loaded[category] = data
+        return self._loaded[category]
+
+    def count(self, category):
+        return len(self._load(category))
+
+    def iter_entries(self, category, offset=0, limit=None, fields=None):
+        # A JSON array cannot be read incrementally; these batches are loaded once per category
+        yield from self.read(category, offset, limit, fields)
+
+    def columns(self, category):
+        columns = {}
+        for entry in self._load(category):
+            for key in entry:
+                columns[key] = None
+        return list(columns)
+
+    def read(self, category, offset=0, limit=None, fields=None):
+        entries = self._load(category)
+        entries = entries[offset:] if limit is None else entries[offset:offset + limit]
+        if fields is None:
+            return entries
+        if category.startswith('unmatched_'):
+            return [_project(record, fields) for record in entries]
+        return [_project_entry(entry, fields) for entry in entries]
+
+
+def _project_entry(entry, fields):
+    projected = dict(entry)
+    for key in ('source_record', 'target_record'):
+        if key in projected:
+            projected[key] = _project(projected[key], fields)
+    if 'targets' in projected:
+        projected['targets'] = [_project_entry(target, fields) for target in projected['targets']]
+    return projected
+
+
+def open_results(batch_info):
+    """The results of a batch entry from batch_data.json, whichever format they were saved in."""
+    batch_dir = batch_info.get('batch_dir')
+    if batch_dir and os.path.exists(os.path.join(batch_dir, MANIFEST_NAME)):
+        return ResultStore(batch_dir)
+    return LegacyResults(batch_info)
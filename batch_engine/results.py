@@ -0,0 +1,48 @@
+def format_rationale(rule, src_field, tgt_field, source, target):
+    rationale_template = (rule.get('rationale_statement') if rule else "") or ""
+    try:
+        return rationale_template.format(
+            src_field=src_field,
+            tgt_field=tgt_field,
+            src_value=source.get(src_field) if src_field else None,
+            tgt_value=target.get(tgt_field) if tgt_field else None,
+            source=source,
+            target=target
+        )
+    except Exception:
+        return rationale_template
+
+
+def apply_rationale(entry, source=None, target=None):
+    """Format an entry's rationale_statement once, after classification decided it is kept."""
+    source = entry['source_record'] if source is None else source
+    target = entry['target_record'] if target is None else target
+    entry['rationale_statement'] = format_rationale(entry.get('rule'), entry.get('src_field'), entry.get('tgt_field'), source, target)
+    return entry
+
+
+def match_entry(rule, src_idx, tgt_idx, source, target):
+    """A raw match; its rationale_statement is filled in by apply_rationale for final entries only."""
+    src_field = rule['source_field']
+    tgt_field = rule['target_field']
+    return {
+        'source_index': src_idx,
+        'target_index': tgt_idx,
+        'source_record': source,
+        'target_record': target,
+        'rule_id': rule['rule_id'],
+        'rule': rule,
+        'src_field': src_field,
+        'tgt_field': tgt_field,
+        'rationale_statement': None
+    }
+
+
+def scored_entry(state, src_pos, tgt_pos, source_store, target_store):
+    """The raw match for a pair kept by match_records, with its combination and score."""
+    entry = match_entry(state['rule'], source_store.index[src_pos], target_store.index[tgt_pos],
+                        source_store.record(src_pos), target_store.record(tgt_pos))
+    if state['combination'] is not None:
+        entry['combination'] = [target_store.index[pos] for pos in state['combination']]
+    entry['score'] = state['score']
+    return entry
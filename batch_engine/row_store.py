@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+
+
+class RowStore:
+    """
+    A DataFrame converted once into a plain 2D array. Rules read whole columns as
+    Python lists, and full record dicts are only built (and cached) for rows that
+    end up in a match. Values come from the same common-dtype array iterrows() uses,
+    so they are identical to the old per-pair row.to_dict() records.
+    """
+    def __init__(self, df):
+        self.index = df.index.tolist()
+        self.columns = df.columns.tolist()
+        self.rows = df.to_numpy()
+        self._records = {}
+
+    def __len__(self):
+        return len(self.index)
+
+    def column(self, field, start=None, end=None):
+        return self.rows[start:end, self.columns.index(field)].tolist()
+
+    def record(self, pos):
+        record = self._records.get(pos)
+        if record is None:
+            record = self._records[pos] = dict(zip(self.columns, self.rows[pos].tolist()))
+        return record
+
+    def records(self):
+        """
+        Every row as a record dict in row order, for storing: NaN, NaT and infinite
+        values become None in one vectorized pass over the array, so records encode as
+        strict JSON. Rules keep seeing the original values; the record cache is not filled.
+        """
+        rows = self.rows
+        if rows.dtype.kind == 'f':
+            missing = ~np.isfinite(rows)
+        elif rows.dtype.kind == 'O':
+            missing = pd.isna(rows) | (rows == np.inf) | (rows == -np.inf)
+        else:
+            missing = None
+        if missing is not None and missing.any():
+            rows = rows.astype(object)
+            rows[missing] = None
+        for row in rows:
+            yield dict(zip(self.columns, row.tolist()))
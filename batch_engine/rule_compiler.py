@@ -0,0 +1,88 @@
+import hashlib
+
+# Compiled code blocks keyed by the sha256 of their source text. Rules are
+# re-read from rule_data.json on every batch, so an unchanged code_block is
+# exec()'d and compile()'d once per process instead of once per record pair.
+_CODE_BLOCK_CACHE = {}
+
+
+def code_block_hash(code_block):
+    return hashlib.sha256(code_block.encode('utf-8')).hexdigest()
+
+
+class CompiledCodeBlock:
+    """
+    A code_block turned into ready-made callables: the `rule_code_block` function
+    (if the block defines one) and the expression fallback (if the block is a valid expression).
+    """
+    def __init__(self, code_block):
+        self.code_hash = code_block_hash(code_block)
+        self.func = None
+        self.func_error = None
+        self.expression = None
+        self.expression_error = None
+        try:
+            func_env = {}
+            exec(compile(code_block, '<string>', 'exec'), func_env)
+            rule_func = func_env.get('rule_code_block')
+            if callable(rule_func):
+                self.func = rule_func
+        except Exception as ex:
+            self.func_error = ex
+        try:
+            self.expression = compile(code_block, '<string>', 'eval')
+        except Exception as ex:
+            self.expression_error = ex
+
+
+def compile_code_block(code_block):
+    code_hash = code_block_hash(code_block)
+    compiled = _CODE_BLOCK_CACHE.get(code_hash)
+    if compiled is None:
+        compiled = CompiledCodeBlock(code_block)
+        _CODE_BLOCK_CACHE[code_hash] = compiled
+    return compiled
+
+
+class CompiledRule:
+    """
+    Callable wrapper around an active rule. Calling it with the rule's source and target
+    field values returns the match result, with the same fallbacks the batch loop has
+    always applied: rule_code_block function, then expression, then plain equality.
+    Only the expression fallback needs the full records (needs_records).
+    """
+    def __init__(self, rule):
+        self.rule = rule
+        self.rule_id = rule.get('rule_id')
+        self.src_field = rule.get('source_field')
+        self.tgt_field = rule.get('target_field')
+        code_block = rule.get('code_block')
+        self.code_block = compile_code_block(code_block) if code_block else None
+        self.needs_records = self.code_block is not None and self.code_block.expression is not None
+        if self.code_block and self.code_block.func_error is not None:
+            print(f"[DEBUG] Error executing code_block as function for rule {self.rule_id}, using it as expression: {self.code_block.func_error}")
+        if self.code_block and self.code_block.func is None and self.code_block.expression is None:
+            print(f"[DEBUG] code_block for rule {self.rule_id} is neither a rule_code_block function nor an expression: {self.code_block.expression_error}")
+
+    def _eval_expression(self, source, target):
+        if self.code_block.expression is None:
+            return False
+        return eval(self.code_block.expression, {}, {'source': source, 'target': target})
+
+    def __call__(self, src_value, tgt_value, source=None, target=None):
+        try:
+            if self.code_block is None:
+                return src_value == tgt_value
+            if self.code_block.func is not None:
+                try:
+                    return self.code_block.func(src_value, tgt_value)
+                except Exception as ex:
+                    print(f"[DEBUG] Error executing code_block as function, trying as expression: {ex}")
+            return self._eval_expression(source, target)
+        except Exception as e:
+            print(f"[DEBUG] Error in rule matching: {e}")
+            return False
+
+
+def compile_rules(rules):
+    return [CompiledRule(rule) for rule in rules]
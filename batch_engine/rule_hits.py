@@ -0,0 +1,111 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from batch_engine.scoring import is_decisive
+
+# Raw hits of every scoring rule of a run, saved in the batch directory so a re-run
+# only has to evaluate the rules added or edited since.
+RULE_HITS_NAME = 'rule_hits.json'
+RULE_HITS_ARRAYS = 'rule_hits.npz'
+RULE_HITS_VERSION = 1
+# Rule keys that never change which pairs a rule matches
+NON_MATCHING_KEYS = ('rule_name', 'description', 'rationale_statement', 'match_classification',
+                     'is_active', 'weight', 'tie-breaker')
+
+
+def rule_version(rule):
+    """Hash of everything in a rule that decides which pairs it matches."""
+    matching = {key: value for key, value in rule.items() if key not in NON_MATCHING_KEYS}
+    return hashlib.sha256(json.dumps(matching, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+class RuleHits:
+    """
+    Hits (src_pos, tgt_pos, combination) per scoring rule, recorded in priority order.
+    A pair rule is not evaluated on pairs a higher-priority decisive rule already
+    matched, so for a pair rule only the pairs outside skipped_pairs() are covered.
+    """
+    def __init__(self, source_file=None, target_file=None):
+        self.source_file = source_file
+        self.target_file = target_file
+        self.rules = []
+        self._by_id = None
+        self._decided_rank = None
+
+    def record(self, rule, hits):
+        self.rules.append({'rule_id': rule.get('rule_id'), 'version': rule_version(rule),
+                           'decisive': is_decisive(rule), 'hits': hits})
+
+    def _recorded(self, rule):
+        if self._by_id is None:
+            self._by_id = {entry['rule_id']: (rank, entry) for rank, entry in enumerate(self.rules)}
+        return self._by_id.get(rule.get('rule_id'), (None, None))
+
+    def hits(self, rule):
+        """The recorded hits of this version of the rule, or None."""
+        _, entry = self._recorded(rule)
+        if entry is None or entry['version'] != rule_version(rule):
+            return None
+        return entry['hits']
+
+    def skipped_pairs(self, rule):
+        """Pairs a decisive rule recorded before this one matched, i.e. pairs it may not have been evaluated on."""
+        if self._decided_rank is None:
+            self._decided_rank = {}
+            for rank, entry in enumerate(self.rules):
+                if entry['decisive']:
+                    for src_pos, tgt_pos, _ in entry['hits']:
+                        self._decided_rank.setdefault((src_pos, tgt_pos), rank)
+        rank, _ = self._recorded(rule)
+        return {pair for pair, decided_rank in self._decided_rank.items() if decided_rank < rank}
+
+    def save(self, batch_dir):
+        arrays = {}
+        rules = []
+        for entry in self.rules:
+            saved = {'rule_id': entry['rule_id'], 'version': entry['version'], 'decisive': entry['decisive']}
+            if any(combination is not None for _, _, combination in entry['hits']):
+                # Numeric Combinations: each combination once, in the order found (a pair in
+                # several combinations reports the first one)
+                saved['combinations'] = list(dict.fromkeys((src_pos, combination) for src_pos, _, combination in entry['hits']))
+            else:
+                saved['pairs'] = f'rule_{len(rules)}'
+                pairs = [(src_pos, tgt_pos) for src_pos, tgt_pos, _ in entry['hits']]
+                arrays[saved['pairs']] = np.array(pairs, dtype=np.int64).reshape(-1, 2)
+            rules.append(saved)
+        np.savez(os.path.join(batch_dir, RULE_HITS_ARRAYS), **arrays)
+        with open(os.path.join(batch_dir, RULE_HITS_NAME), 'w', encoding='utf-8') as f:
+            json.dump({'version': RULE_HITS_VERSION, 'source_file': self.source_file,
+                       'target_file': self.target_file, 'rules': rules}, f, default=int)
+
+
+def load_rule_hits(batch_dir, source_file, target_file):
+    """
+    The RuleHits saved by a run in batch_dir, or None when there are none or they do
+    not belong to these source/target files (positions would not line up).
+    """
+    path = os.path.join(batch_dir, RULE_HITS_NAME)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            saved = json.load(f)
+        if saved.get('version') != RULE_HITS_VERSION or (saved.get('source_file'), saved.get('target_file')) != (source_file, target_file):
+            return None
+        rule_hits = RuleHits(source_file, target_file)
+        with np.load(os.path.join(batch_dir, RULE_HITS_ARRAYS)) as arrays:
+            for entry in saved['rules']:
+                if 'combinations' in entry:
+                    hits = [(src_pos, tgt_pos, tuple(combination))
+                            for src_pos, combination in entry['combinations'] for tgt_pos in combination]
+                else:
+                    hits = [(src_pos, tgt_pos, None) for src_pos, tgt_pos in arrays[entry['pairs']].tolist()]
+                rule_hits.rules.append({'rule_id': entry['rule_id'], 'version': entry['version'],
+                                        'decisive': entry['decisive'], 'hits': hits})
+        return rule_hits
+    except Exception as e:
+        print(f"[DEBUG] Ignoring unreadable rule hits in {batch_dir}: {e}")
+        return None
@@ -0,0 +1,88 @@
+import numbers
+from collections import defaultdict
+
+# Rules without a usable weight count as full-confidence rules
+DEFAULT_RULE_WEIGHT = 100
+# A matching rule at or above this weight decides its pair: lower-priority rules are
+# not evaluated for that pair any more. Lighter rules only add to the pair's score.
+DECISIVE_WEIGHT = 100
+
+
+def rule_weight(rule):
+    weight = rule.get('weight', DEFAULT_RULE_WEIGHT)
+    if isinstance(weight, bool) or not isinstance(weight, numbers.Number):
+        return DEFAULT_RULE_WEIGHT
+    return weight
+
+
+def is_decisive(rule):
+    return rule_weight(rule) >= DECISIVE_WEIGHT
+
+
+def is_tie_breaker(rule):
+    return rule.get('tie-breaker') is True
+
+
+def priority_order(rules):
+    """Rules by descending weight; equal weights keep the lowest rule_id first."""
+    return sorted(rules, key=lambda rule: (-rule_weight(rule), rule.get('rule_id')))
+
+
+class PairScores:
+    """
+    Scores (source position, target position) pairs from rule hits fed in priority order.
+    The first rule to hit a pair is the rule reported for it, every further hit adds its
+    weight, and hits after a decisive rule matched the pair are ignored.
+    """
+    def __init__(self):
+        self.pairs = {}
+
+    def add(self, rank, rule, hits):
+        """hits: (src_pos, tgt_pos, combination) with combination None outside Numeric Combinations."""
+        weight = rule_weight(rule)
+        decisive = is_decisive(rule)
+        for src_pos, tgt_pos, combination in hits:
+            state = self.pairs.get((src_pos, tgt_pos))
+            if state is None:
+                self.pairs[(src_pos, tgt_pos)] = {
+                    'rule': rule, 'score': weight, 'rank': rank,
+                    'decided': decisive, 'combination': combination
+                }
+            elif not state['decided'] and state['rank'] != rank:
+                state['score'] += weight
+                state['rank'] = rank
+                state['decided'] = decisive
+
+    def settle(self, tie_breaker=None):
+        """
+        Settle sources linked to several candidates (a numeric combination is one
+        candidate): only the best-scoring candidates are kept, and remaining ties are
+        passed to tie_breaker(pairs) -> {pair: tie score} when one is given. A source
+        still left with several candidates is reported as suspected downstream.
+        Returns the kept pairs as (src_pos, tgt_pos, state) in pair order.
+        """
+        candidates = defaultdict(lambda: defaultdict(list))
+        for pair, state in self.pairs.items():
+            group = state['combination'] if state['combination'] is not None else pair[1]
+            candidates[pair[0]][group].append(pair)
+
+        kept = []
+        tied_sources = []
+        for groups in candidates.values():
+            if len(groups) > 1:
+                group_score = {group: max(self.pairs[pair]['score'] for pair in pairs) for group, pairs in groups.items()}
+                best = max(group_score.values())
+                groups = {group: pairs for group, pairs in groups.items() if group_score[group] == best}
+                if len(groups) > 1 and tie_breaker is not None:
+                    tied_sources.append(groups)
+                    continue
+            kept.extend(pair for pairs in groups.values() for pair in pairs)
+
+        if tied_sources:
+            tie_scores = tie_breaker([pair for groups in tied_sources for pairs in groups.values() for pair in pairs])
+            for groups in tied_sources:
+                group_tie = {group: max(tie_scores.get(pair, 0) for pair in pairs) for group, pairs in groups.items()}
+                best = max(group_tie.values())
+                kept.extend(pair for group, pairs in groups.items() if group_tie[group] == best for pair in pairs)
+
+        return [(src_pos, tgt_pos, self.pairs[(src_pos, tgt_pos)]) for src_pos, tgt_pos in sorted(kept)]
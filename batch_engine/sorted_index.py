@@ -0,0 +1,49 @@
+from bisect import bisect_left
+
+from batch_engine.keys import match_key
+
+
+class SortedKeyIndex:
+    """
+    Target keys kept in sorted order so every key starting with a given prefix sits
+    in one contiguous run, found with a bisect in O(log T + k).
+    """
+    def __init__(self, keys):
+        self.order = sorted(range(len(keys)), key=keys.__getitem__)
+        self.sorted_keys = [keys[pos] for pos in self.order]
+
+    def starting_with(self, prefix):
+        start = bisect_left(self.sorted_keys, prefix)
+        end = start
+        while end < len(self.sorted_keys) and self.sorted_keys[end].startswith(prefix):
+            end += 1
+        return sorted(self.order[start:end])
+
+
+class _AffixIndex:
+    key_blocked = True
+    reverse = False
+
+    def __init__(self, target_values, options=None):
+        self.index = SortedKeyIndex([self._key(value) for value in target_values])
+
+    def _key(self, value):
+        key = match_key(value)
+        return key[::-1] if self.reverse else key
+
+    def candidates(self, source_values):
+        candidates = {}
+        for src_pos, value in enumerate(source_values):
+            tgt_positions = self.index.starting_with(self._key(value))
+            if tgt_positions:
+                candidates[src_pos] = tgt_positions
+        return candidates
+
+
+class PrefixIndex(_AffixIndex):
+    """Candidate pairs for "Prefix" rules: the normalized source value starts the target value."""
+
+
+class SuffixIndex(_AffixIndex):
+    """Candidate pairs for "Suffix" rules: the same prefix lookup over reversed keys."""
+    reverse = True
@@ -0,0 +1,39 @@
+import os
+
+import pandas as pd
+
+# Source CSVs at least this large (BATCH_STREAMING_THRESHOLD_MB) are matched chunk by
+# chunk instead of being loaded whole; BATCH_STREAMING_CHUNK_ROWS sets the chunk size.
+DEFAULT_STREAMING_THRESHOLD_MB = 1024
+DEFAULT_STREAMING_CHUNK_ROWS = 100000
+
+
+def _env_number(name, default):
+    try:
+        return max(1, int(os.environ.get(name, default)))
+    except ValueError:
+        return default
+
+
+def streaming_enabled(source_path):
+    if not source_path.endswith('.csv'):
+        return False
+    threshold_mb = _env_number('BATCH_STREAMING_THRESHOLD_MB', DEFAULT_STREAMING_THRESHOLD_MB)
+    return os.path.getsize(source_path) >= threshold_mb * 1024 * 1024
+
+
+def csv_columns(path):
+    return pd.read_csv(path, nrows=0).columns.tolist()
+
+
+def source_chunks(source_path):
+    """
+    Yield the source CSV in chunks of BATCH_STREAMING_CHUNK_ROWS rows as
+    (DataFrame, fraction of the file read so far). Chunks keep counting the row index
+    and have their columns sorted like a full load.
+    """
+    chunk_rows = _env_number('BATCH_STREAMING_CHUNK_ROWS', DEFAULT_STREAMING_CHUNK_ROWS)
+    file_size = os.path.getsize(source_path) or 1
+    with open(source_path, 'rb') as f:
+        for chunk in pd.read_csv(f, chunksize=chunk_rows):
+            yield chunk.sort_index(axis=1), min(f.tell() / file_size, 1)
@@ -0,0 +1,86 @@
+from collections import defaultdict, deque
+
+from batch_engine.keys import match_key
+
+
+class AhoCorasick:
+    """
+    Aho-Corasick automaton over a set of patterns. find_all() scans a text once and
+    returns the ids of every pattern occurring in it, in O(len(text) + matches).
+    """
+    def __init__(self, patterns):
+        self.goto = [{}]
+        self.fail = [0]
+        self.outputs = [[]]
+        for pattern_id, pattern in enumerate(patterns):
+            state = 0
+            for char in pattern:
+                next_state = self.goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self.goto)
+                    self.goto[state][char] = next_state
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.outputs.append([])
+                state = next_state
+            self.outputs[state].append(pattern_id)
+        # Breadth-first pass to wire failure links and inherit their outputs
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[next_state] = self.goto[fallback].get(char, 0)
+                self.outputs[next_state] = self.outputs[next_state] + self.outputs[self.fail[next_state]]
+
+    def find_all(self, text):
+        found = set()
+        state = 0
+        goto, fail, outputs = self.goto, self.fail, self.outputs
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if outputs[state]:
+                found.update(outputs[state])
+        return found
+
+
+class SubstringIndex:
+    """
+    Candidate pairs for "Contains/Substr" rules: pairs whose normalized source value
+    occurs inside the normalized target value. The target side keeps its distinct keys;
+    each probe builds one automaton over the distinct source keys and runs it once over
+    each distinct target key.
+    """
+    key_blocked = True
+
+    def __init__(self, target_values, options=None):
+        self.target_positions = defaultdict(list)
+        for tgt_pos, value in enumerate(target_values):
+            self.target_positions[match_key(value)].append(tgt_pos)
+        self.target_count = len(target_values)
+
+    def candidates(self, source_values):
+        source_positions = defaultdict(list)
+        for src_pos, value in enumerate(source_values):
+            source_positions[match_key(value)].append(src_pos)
+        # An empty key is contained in every target, so those rows keep a full scan
+        empty_positions = source_positions.pop('', [])
+        patterns = list(source_positions)
+        automaton = AhoCorasick(patterns)
+
+        candidates = defaultdict(list)
+        for key, tgt_positions in self.target_positions.items():
+            for pattern_id in automaton.find_all(key):
+                for src_pos in source_positions[patterns[pattern_id]]:
+                    candidates[src_pos].extend(tgt_positions)
+        for tgt_positions in candidates.values():
+            tgt_positions.sort()
+        all_target_positions = list(range(self.target_count))
+        for src_pos in empty_positions:
+            candidates[src_pos] = all_target_positions
+        return dict(candidates)
@@ -0,0 +1,79 @@
+import math
+import numbers
+
+import pandas as pd
+
+from batch_engine.substring_index import AhoCorasick
+
+# Built-in operators a declarative rule can use instead of an LLM-generated code_block
+DECLARATIVE_MATCH_TYPES = ("Exact", "Case-Insensitive", "Prefix", "Suffix", "Contains/Substr")
+
+
+def is_declarative(rule):
+    return rule.get('declarative') is True and rule.get('match_type') in DECLARATIVE_MATCH_TYPES
+
+
+def _as_text(value):
+    if value is None or (isinstance(value, float) and math.isnan(value)) or value is pd.NaT:
+        return None
+    if isinstance(value, numbers.Number) and not isinstance(value, (bool, complex)):
+        number = float(value)
+        if math.isfinite(number) and number.is_integer():
+            return str(int(number))
+    return str(value)
+
+
+def normalized_keys(series, match_type, options):
+    """
+    Column values as comparison keys indexed by row position. Nulls and empty values
+    never match. Options: ignore_case (always on for Case-Insensitive), ignore_whitespace
+    (drop all whitespace) and strip (trim the ends, on by default).
+    """
+    keys = series.reset_index(drop=True).map(_as_text).dropna().astype(str)
+    if options.get('ignore_whitespace'):
+        keys = keys.str.replace(r'\s+', '', regex=True)
+    elif options.get('strip', True):
+        keys = keys.str.strip()
+    if match_type == 'Case-Insensitive' or options.get('ignore_case'):
+        keys = keys.str.casefold()
+    return keys[keys != '']
+
+
+def _affix_join(src, tgt, take_affix):
+    """Join source keys against every target prefix/suffix of a length some source key has."""
+    lengths = sorted(set(src['key'].str.len()))
+    tgt = tgt.assign(affix=tgt['key'].map(
+        lambda key: [take_affix(key, length) for length in lengths if length <= len(key)]
+    )).explode('affix').dropna(subset=['affix'])
+    return src.merge(tgt, left_on='key', right_on='affix')
+
+
+def _contains_join(src, tgt):
+    patterns = src['key'].unique().tolist()
+    automaton = AhoCorasick(patterns)
+    found = tgt.assign(key=tgt['key'].map(lambda key: [patterns[i] for i in automaton.find_all(key)]))
+    found = found.explode('key').dropna(subset=['key'])
+    return src.merge(found, on='key')
+
+
+def declarative_matches(rule, df_source, df_target):
+    """
+    Evaluate a declarative rule column-wise over the two DataFrames and return the
+    matching (source position, target position) pairs in row order.
+    """
+    match_type = rule.get('match_type')
+    options = rule.get('options') or {}
+    src = normalized_keys(df_source[rule['source_field']], match_type, options).rename_axis('src_pos').reset_index(name='key')
+    tgt = normalized_keys(df_target[rule['target_field']], match_type, options).rename_axis('tgt_pos').reset_index(name='key')
+    if src.empty or tgt.empty:
+        return []
+    if match_type in ('Exact', 'Case-Insensitive'):
+        pairs = src.merge(tgt, on='key')
+    elif match_type == 'Prefix':
+        pairs = _affix_join(src, tgt, lambda key, length: key[:length])
+    elif match_type == 'Suffix':
+        pairs = _affix_join(src, tgt, lambda key, length: key[len(key) - length:])
+    else:
+        pairs = _contains_join(src, tgt)
+    pairs = pairs[['src_pos', 'tgt_pos']].drop_duplicates().sort_values(['src_pos', 'tgt_pos'])
+    return list(zip(pairs['src_pos'].tolist(), pairs['tgt_pos'].tolist()))
@@ -0,0 +1 @@
+# Puts the project root on sys.path so plain `pytest` imports batch_engine and microservices
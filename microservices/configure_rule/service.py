@@ -1,6 +1,7 @@
 import os
 import json
 from agents.rule_code_block_agent import RuleCodeBlockAgent
+from batch_engine.vectorized import DECLARATIVE_MATCH_TYPES
 
 RULE_DATA_PATH = os.path.abspath(os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'db_jsons', 'rule_data.json'))
 STATIC_DATA_PATH = os.path.abspath(os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'db_jsons', 'static_data.json'))
@@ -24,6 +25,16 @@ def add_rule_data(rule_dict):
         raise ValueError(f"Invalid match_classification: {rule_dict['match_classification']}")
     if rule_dict["match_type"] not in match_type_options:
         raise ValueError(f"Invalid match_type: {rule_dict['match_type']}")
+    if "options" in rule_dict and not isinstance(rule_dict["options"], dict):
+        raise ValueError("options must be a JSON object.")
+    if "declarative" in rule_dict and not isinstance(rule_dict["declarative"], bool):
+        raise ValueError("declarative must be true or false.")
+    if "weight" in rule_dict and (isinstance(rule_dict["weight"], bool) or not isinstance(rule_dict["weight"], (int, float)) or rule_dict["weight"] < 0):
+        raise ValueError("weight must be a non-negative number.")
+    if "tie-breaker" in rule_dict and not isinstance(rule_dict["tie-breaker"], bool):
+        raise ValueError("tie-breaker must be true or false.")
+    if rule_dict.get("declarative") and rule_dict["match_type"] not in DECLARATIVE_MATCH_TYPES:
+        raise ValueError(f"match_type '{rule_dict['match_type']}' cannot be declarative. Supported: {', '.join(DECLARATIVE_MATCH_TYPES)}")
     # Validate source_field and target_field exist in field_data.json (active fields only)
     try:
         with open(FIELD_DATA_PATH, 'r', encoding='utf-8') as f:
@@ -79,36 +90,38 @@ def add_rule_data(rule_dict):
     # Ensure description is present
     if "description" not in rule or not rule["description"]:
         raise ValueError("Missing required key: description")
-    # Generate code_block using ADK agent, validate, and auto-fix if needed
-    from agents.code_compilation_agent import CodeCompilationAgent
-    try:
-        agent = RuleCodeBlockAgent()
-        code_block = agent.generate_code_block(
-            rule["description"],
-            rule["rationale_statement"],
-            rule["source_field"],
-            rule["target_field"]
-        )
-        if not code_block or not code_block.strip():
-            raise ValueError("Failed to generate code_block from agent.")
-        # Validate code_block with mock data
-        compilation_agent = CodeCompilationAgent()
-        mock_inputs = ("mock_source", "mock_target")
-        result = compilation_agent.validate_code_block(code_block, "rule_code_block", mock_inputs)
-        if not result["success"]:
-            # Auto-fix with ADK agent
+    # Declarative rules run as a built-in operator, so there is no code_block to generate
+    if not rule.get("declarative"):
+        # Generate code_block using ADK agent, validate, and auto-fix if needed
+        from agents.code_compilation_agent import CodeCompilationAgent
+        try:
+            agent = RuleCodeBlockAgent()
             code_block = agent.generate_code_block(
                 rule["description"],
                 rule["rationale_statement"],
                 rule["source_field"],
                 rule["target_field"]
             )
+            if not code_block or not code_block.strip():
+                raise ValueError("Failed to generate code_block from agent.")
+            # Validate code_block with mock data
+            compilation_agent = CodeCompilationAgent()
+            mock_inputs = ("mock_source", "mock_target")
             result = compilation_agent.validate_code_block(code_block, "rule_code_block", mock_inputs)
             if not result["success"]:
-                raise ValueError(f"Generated code_block is invalid: {result['error']}\n{result['traceback']}")
-        rule["code_block"] = code_block
-    except Exception as e:
-        raise ValueError(f"Error generating code_block: {e}")
+                # Auto-fix with ADK agent
+                code_block = agent.generate_code_block(
+                    rule["description"],
+                    rule["rationale_statement"],
+                    rule["source_field"],
+                    rule["target_field"]
+                )
+                result = compilation_agent.validate_code_block(code_block, "rule_code_block", mock_inputs)
+                if not result["success"]:
+                    raise ValueError(f"Generated code_block is invalid: {result['error']}\n{result['traceback']}")
+            rule["code_block"] = code_block
+        except Exception as e:
+            raise ValueError(f"Error generating code_block: {e}")
     try:
         with open(RULE_DATA_PATH, 'r', encoding='utf-8') as f:
             data = json.load(f)
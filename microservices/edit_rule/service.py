@@ -1,10 +1,12 @@
 import os
 import json
-from agents.rule_code_block_agent import RuleCodeBlockAgent
+from batch_engine.vectorized import DECLARATIVE_MATCH_TYPES
 
 RULE_DATA_PATH = os.path.abspath(os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'db_jsons', 'rule_data.json'))
 STATIC_DATA_PATH = os.path.abspath(os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'db_jsons', 'static_data.json'))
 FIELD_DATA_PATH = os.path.abspath(os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'db_jsons', 'field_data.json'))
+# Keys an edit may add to a rule that does not have them yet
+OPTIONAL_RULE_KEYS = ("description", "options", "declarative", "weight", "tie-breaker")
 
 def get_static_options():
     with open(STATIC_DATA_PATH, 'r', encoding='utf-8') as f:
@@ -41,10 +43,25 @@ def edit_rule_data(rule_id, updates):
             raise ValueError(f"Invalid match_type: {v}")
         if k in ("source_field", "target_field") and v not in active_field_names:
             raise ValueError(f"{k} '{v}' does not exist in active fields.")
-        if k in updated_rule or k == "description":
+        if k == "options" and not isinstance(v, dict):
+            raise ValueError("options must be a JSON object.")
+        if k == "declarative" and not isinstance(v, bool):
+            raise ValueError("declarative must be true or false.")
+        if k == "weight" and (isinstance(v, bool) or not isinstance(v, (int, float)) or v < 0):
+            raise ValueError("weight must be a non-negative number.")
+        if k == "tie-breaker" and not isinstance(v, bool):
+            raise ValueError("tie-breaker must be true or false.")
+        if k in updated_rule or k in OPTIONAL_RULE_KEYS:
             updated_rule[k] = v
         if k in ("description", "rationale_statement", "source_field", "target_field"):
             needs_regen = True
+    # Declarative rules run as a built-in operator and never carry a code_block
+    if updated_rule.get("declarative"):
+        if updated_rule.get("match_type") not in DECLARATIVE_MATCH_TYPES:
+            raise ValueError(f"match_type '{updated_rule.get('match_type')}' cannot be declarative. Supported: {', '.join(DECLARATIVE_MATCH_TYPES)}")
+        needs_regen = False
+    elif rule_to_update.get("declarative"):
+        needs_regen = True
     
     # Check for duplicate rule name
     if "rule_name" in updates:
@@ -86,12 +103,15 @@ def edit_rule_data(rule_id, updates):
     
     # Apply the updates to the actual rule
     for k, v in updates.items():
-        if k in rule_to_update or k == "description":
+        if k in rule_to_update or k in OPTIONAL_RULE_KEYS:
             rule_to_update[k] = v
+    if rule_to_update.get("declarative"):
+        rule_to_update.pop("code_block", None)
     
     # Regenerate code_block if relevant fields changed
     if needs_regen:
         from agents.code_compilation_agent import CodeCompilationAgent
+        from agents.rule_code_block_agent import RuleCodeBlockAgent
         try:
             agent = RuleCodeBlockAgent()
             code_block = agent.generate_code_block(
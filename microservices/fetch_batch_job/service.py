@@ -0,0 +1,17 @@
+from flask import jsonify
+from batch_engine.jobs import get_job
+
+def fetch_batch_job(job_id):
+    job = get_job(job_id)
+    if not job:
+        return jsonify({
+            "status_code": 404,
+            "status_message": "NOT FOUND",
+            "message": f"Batch job '{job_id}' not found."
+        }), 404
+    return jsonify({
+        "status_code": 200,
+        "status_message": "SUCCESS",
+        "message": f"Batch job is {job['status'].lower()}.",
+        "data": job
+    }), 200
@@ -1,6 +1,7 @@
 import os
 import json
-from flask import request, jsonify
+from flask import request, jsonify, Response, stream_with_context
+from batch_engine.result_store import CATEGORIES, json_safe, open_results
 
 def fetch_batch_results(request):
     data = request.get_json()
@@ -28,24 +29,64 @@ def fetch_batch_results(request):
             "status_message": "NOT FOUND",
             "message": f"Batch with id '{batch_id}' not found."
         }), 404
-    # Read result files
-    def read_json_file(path):
-        if not os.path.exists(path):
-            return None
-        with open(path, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    matched = read_json_file(batch_info['matched_data']['file_path'])
-    suspected = read_json_file(batch_info['suspected_data']['file_path'])
-    unmatched_source = read_json_file(batch_info['unmatched_source_data']['file_path'])
-    unmatched_target = read_json_file(batch_info['unmatched_target_data']['file_path'])
+    # Optional paging: categories to return, offset/limit per category, record fields to keep
+    categories = data.get('categories') or list(CATEGORIES)
+    if isinstance(categories, str):
+        categories = [categories]
+    offset = data.get('offset', 0)
+    limit = data.get('limit')
+    fields = data.get('fields')
+    invalid = [c for c in categories if c not in CATEGORIES] if isinstance(categories, list) else [categories]
+    if invalid:
+        return jsonify({
+            "status_code": 400,
+            "status_message": "BAD REQUEST",
+            "message": f"Invalid categories: {invalid}. Supported: {', '.join(CATEGORIES)}"
+        }), 400
+    if isinstance(offset, bool) or not isinstance(offset, int) or offset < 0:
+        return jsonify({
+            "status_code": 400,
+            "status_message": "BAD REQUEST",
+            "message": "offset must be a non-negative integer."
+        }), 400
+    if limit is not None and (isinstance(limit, bool) or not isinstance(limit, int) or limit < 1):
+        return jsonify({
+            "status_code": 400,
+            "status_message": "BAD REQUEST",
+            "message": "limit must be a positive integer."
+        }), 400
+    if fields is not None and (not isinstance(fields, list) or not all(isinstance(f, str) for f in fields)):
+        return jsonify({
+            "status_code": 400,
+            "status_message": "BAD REQUEST",
+            "message": "fields must be a list of field names."
+        }), 400
+    stream = data.get('stream', False)
+    if not isinstance(stream, bool):
+        return jsonify({
+            "status_code": 400,
+            "status_message": "BAD REQUEST",
+            "message": "stream must be true or false."
+        }), 400
+    results = open_results(batch_info)
+    if stream:
+        # NDJSON, one {"category", "data"} object per line, read from disk entry by entry;
+        # results stored before NaN was written as null still hold NaN
+        def generate():
+            for category in categories:
+                for entry in results.iter_entries(category, offset, limit, fields):
+                    yield json.dumps({"category": category, "data": json_safe(entry)}, allow_nan=False) + "\n"
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson'), 200
+    # Read only the requested page of each result category
+    result_data = {}
+    pagination = {}
+    for category in categories:
+        result_data[category] = json_safe(results.read(category, offset, limit, fields))
+        pagination[category] = {"offset": offset, "limit": limit, "total": results.count(category)}
     return jsonify({
         "status_code": 200,
         "status_message": "SUCCESS",
         "message": f"Results for batch {batch_id} fetched successfully.",
-        "data": {
-            "matched": matched,
-            "suspected": suspected,
-            "unmatched_source": unmatched_source,
-            "unmatched_target": unmatched_target
-        }
+        "data": result_data,
+        "pagination": pagination
     }), 200
@@ -0,0 +1,13 @@
+from flask import jsonify
+from .service import fetch_batch_summary
+
+def fetch_batch_summary_controller(batch_id):
+    try:
+        return fetch_batch_summary(batch_id)
+    except Exception as e:
+        print(f"[ERROR] {e}")
+        return jsonify({
+            "status_code": 500,
+            "status_message": "INTERNAL SERVER ERROR",
+            "message": "Unexpected error occurred. Please try again!"
+        }), 500
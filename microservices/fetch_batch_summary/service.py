@@ -0,0 +1,33 @@
+import os
+import json
+from flask import jsonify
+from batch_engine.batch_summary import stored_summary, summarize_results
+from batch_engine.result_store import open_results
+
+def fetch_batch_summary(batch_id):
+    BATCH_DATA_PATH = os.path.abspath(os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'db_jsons', 'batch_data.json'))
+    if not os.path.exists(BATCH_DATA_PATH):
+        return jsonify({
+            "status_code": 404,
+            "status_message": "NOT FOUND",
+            "message": "No batch data found."
+        }), 404
+    with open(BATCH_DATA_PATH, 'r', encoding='utf-8') as f:
+        batch_data = json.load(f)
+    batch_info = next((b for b in batch_data if b.get('batch_id') == batch_id), None)
+    if not batch_info:
+        return jsonify({
+            "status_code": 404,
+            "status_message": "NOT FOUND",
+            "message": f"Batch with id '{batch_id}' not found."
+        }), 404
+    # Stored when the batch was matched; batches from before that are summarized from their results
+    summary = stored_summary(batch_info)
+    if summary is None:
+        summary = summarize_results(open_results(batch_info))
+    return jsonify({
+        "status_code": 200,
+        "status_message": "SUCCESS",
+        "message": f"Summary of batch {batch_id}.",
+        "data": {"batch_id": batch_id, "batch_name": batch_info.get('batch_name'), **summary}
+    }), 200
@@ -1,30 +1,35 @@
-import json
 from agents.bulk_rule_suggestion_agent import BulkRuleSuggestionAgent
 from agents.code_compilation_agent import CodeCompilationAgent
 from microservices.configure_rule.service import add_rule_data
+from batch_engine.ingestion import is_upload, load_upload
 
 
 def suggest_bulk_rules_service(comments, suspected_records):
     # If only indices are provided, resolve to full records
     resolved_records = []
+    # Each batch's files are loaded once per request, from the ingestion cache when available
+    loaded_batches = {}
     for rec in suspected_records:
         if 'source_record' in rec and 'target_record' in rec:
             resolved_records.append(rec)
         elif 'source_index' in rec and 'target_index' in rec and 'batch_dir' in rec:
             # Try to load records from batch files
-            import os, pandas as pd
+            import os
             batch_dir = rec['batch_dir']
-            # Try to find source/target file names
-            source_path = None
-            target_path = None
-            for fname in os.listdir(batch_dir):
-                if 'source' in fname.lower():
-                    source_path = os.path.join(batch_dir, fname)
-                if 'target' in fname.lower():
-                    target_path = os.path.join(batch_dir, fname)
-            if source_path and target_path:
-                df_source = pd.read_excel(source_path) if source_path.endswith('.xlsx') else pd.read_csv(source_path)
-                df_target = pd.read_excel(target_path) if target_path.endswith('.xlsx') else pd.read_csv(target_path)
+            if batch_dir not in loaded_batches:
+                # Try to find source/target file names among the uploaded files
+                source_path = None
+                target_path = None
+                for fname in os.listdir(batch_dir):
+                    if not is_upload(fname):
+                        continue
+                    if 'source' in fname.lower():
+                        source_path = os.path.join(batch_dir, fname)
+                    if 'target' in fname.lower():
+                        target_path = os.path.join(batch_dir, fname)
+                loaded_batches[batch_dir] = (load_upload(source_path), load_upload(target_path)) if source_path and target_path else None
+            if loaded_batches[batch_dir]:
+                df_source, df_target = loaded_batches[batch_dir]
                 src_idx = rec['source_index']
                 tgt_idx = rec['target_index']
                 rec['source_record'] = df_source.iloc[src_idx].to_dict()
@@ -0,0 +1,61 @@
+import datetime
+import random
+import warnings
+
+import pandas as pd
+import pytest
+
+from batch_engine.date_index import DateRangeIndex
+
+DAYS = [datetime.date(2024, 1, 1) + datetime.timedelta(days=offset) for offset in range(0, 20, 3)]
+
+
+def _random_value(rng):
+    day = rng.choice(DAYS)
+    return rng.choice([
+        day.isoformat(),
+        day.strftime('%d %b %Y'),
+        int(day.strftime('%Y%m%d')),
+        float(day.strftime('%Y%m%d')),
+        f"{day.isoformat()}T23:30:00{rng.choice(['+02:00', '-05:00', 'Z'])}",
+        pd.Timestamp(day),
+        'not a date',
+        None,
+        2.5,
+    ])
+
+
+def _reference_date(value):
+    """The UTC date a code_block would read from value, parsed one value at a time."""
+    if isinstance(value, (int, float)) and float(value).is_integer():
+        return pd.Timestamp(datetime.datetime.strptime(str(int(value)), '%Y%m%d'))
+    if isinstance(value, (str, pd.Timestamp)):
+        try:
+            timestamp = pd.Timestamp(value)
+        except ValueError:
+            return None
+        return timestamp.tz_convert(None) if timestamp.tzinfo else timestamp
+    return None
+
+
+def test_yyyymmdd_numbers_are_dates():
+    assert DateRangeIndex(['2024-01-02'], {'tolerance_days': 3}).candidates([20240101]) == {0: [0]}
+
+
+@pytest.mark.parametrize('seed', range(30))
+def test_index_keeps_every_pair_within_the_tolerance(seed):
+    rng = random.Random(seed)
+    tolerance_days = rng.choice([0, 1, 3, 10])
+    source_values = [_random_value(rng) for _ in range(rng.randint(1, 15))]
+    target_values = [_random_value(rng) for _ in range(rng.randint(1, 15))]
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        candidates = DateRangeIndex(target_values, {'tolerance_days': tolerance_days}).candidates(source_values)
+    tolerance = pd.Timedelta(days=tolerance_days)
+    for src_pos, source_value in enumerate(source_values):
+        source_date = _reference_date(source_value)
+        for tgt_pos, target_value in enumerate(target_values):
+            target_date = _reference_date(target_value)
+            # Values without a date are left to the code_block against every row
+            if source_date is None or target_date is None or abs(source_date - target_date) <= tolerance:
+                assert tgt_pos in candidates.get(src_pos, [])
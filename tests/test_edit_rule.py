@@ -0,0 +1,44 @@
+import json
+
+import pytest
+
+from microservices.edit_rule import service
+
+
+@pytest.fixture
+def rule_data(tmp_path, monkeypatch):
+    rules = [{
+        'rule_name': 'Invoice Match',
+        'description': 'Invoice ids are equal.',
+        'source_field': 'invoice_id',
+        'target_field': 'invoice_id',
+        'match_classification': 'Match',
+        'match_type': 'Exact',
+        'rationale_statement': 'Matched on invoice_id.',
+        'is_active': True,
+        'rule_id': 1
+    }]
+    paths = {
+        'RULE_DATA_PATH': (tmp_path / 'rule_data.json', rules),
+        'STATIC_DATA_PATH': (tmp_path / 'static_data.json', {'match_classification': ['Match'], 'match_types': ['Exact']}),
+        'FIELD_DATA_PATH': (tmp_path / 'field_data.json', [{'field_name': 'invoice_id', 'is_active': True}])
+    }
+    for name, (path, data) in paths.items():
+        path.write_text(json.dumps(data), encoding='utf-8')
+        monkeypatch.setattr(service, name, str(path))
+    return paths['RULE_DATA_PATH'][0]
+
+
+def test_edit_adds_weight_and_tie_breaker_to_a_rule_without_them(rule_data):
+    rules = service.edit_rule_data(1, {'weight': 80, 'tie-breaker': True})
+    stored = json.loads(rule_data.read_text(encoding='utf-8'))
+    for rule in (rules[0], stored[0]):
+        assert rule['weight'] == 80
+        assert rule['tie-breaker'] is True
+        assert 'code_block' not in rule
+
+
+def test_edit_rejects_a_negative_weight(rule_data):
+    with pytest.raises(ValueError):
+        service.edit_rule_data(1, {'weight': -1})
+    assert 'weight' not in json.loads(rule_data.read_text(encoding='utf-8'))[0]
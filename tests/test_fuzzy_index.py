@@ -0,0 +1,59 @@
+import difflib
+import random
+
+import pandas as pd
+import pytest
+
+from batch_engine.fuzzy_index import FuzzyIndex, char_grams
+from batch_engine.keys import match_key
+from batch_engine.matching import match_records
+from batch_engine.row_store import RowStore
+
+DIFFLIB_CODE_BLOCK = (
+    'import difflib\n'
+    'def rule_code_block(source_value, target_value):\n'
+    '    return difflib.SequenceMatcher(None, str(source_value).lower(), str(target_value).lower()).ratio() >= 0.8'
+)
+
+
+def _random_name(rng):
+    return ''.join(rng.choice('jonhaJ ') for _ in range(rng.randint(1, 6)))
+
+
+def _jaccard(source_value, target_value):
+    source_grams, target_grams = char_grams(match_key(source_value)), char_grams(match_key(target_value))
+    return len(source_grams & target_grams) / len(source_grams | target_grams)
+
+
+def test_fuzzy_rules_without_a_threshold_are_not_blocked():
+    assert FuzzyIndex(['John']).candidates(['Jon']) is None
+    assert FuzzyIndex(['John'], {'threshold': 'high'}).candidates(['Jon']) is None
+
+
+@pytest.mark.parametrize('seed', range(30))
+def test_default_fuzzy_rule_keeps_every_pair_its_code_block_accepts(seed):
+    rng = random.Random(seed)
+    df_source = pd.DataFrame({'name': [_random_name(rng) for _ in range(rng.randint(1, 10))]})
+    df_target = pd.DataFrame({'customer_name': [_random_name(rng) for _ in range(rng.randint(1, 10))]})
+    rule = {'rule_id': 1, 'match_type': 'Fuzzy', 'source_field': 'name', 'target_field': 'customer_name',
+            'code_block': DIFFLIB_CODE_BLOCK}
+    kept = match_records([rule], df_source, df_target, RowStore(df_source), RowStore(df_target))
+    expected = {(src_pos, tgt_pos)
+                for src_pos, source_value in enumerate(df_source['name'])
+                for tgt_pos, target_value in enumerate(df_target['customer_name'])
+                if difflib.SequenceMatcher(None, source_value.lower(), target_value.lower()).ratio() >= 0.8}
+    # Settling keeps only the best-scoring targets of a source; every rule here scores the same
+    assert {(src_pos, tgt_pos) for src_pos, tgt_pos, _ in kept} == expected
+
+
+@pytest.mark.parametrize('seed', range(30))
+def test_threshold_index_keeps_every_pair_at_or_above_the_threshold(seed):
+    rng = random.Random(seed)
+    threshold = rng.choice([0.1, 0.3, 0.5, 0.8, 1.0])
+    source_values = [_random_name(rng) for _ in range(rng.randint(1, 15))]
+    target_values = [_random_name(rng) for _ in range(rng.randint(1, 15))]
+    candidates = FuzzyIndex(target_values, {'threshold': threshold}).candidates(source_values)
+    for src_pos, source_value in enumerate(source_values):
+        for tgt_pos, target_value in enumerate(target_values):
+            if _jaccard(source_value, target_value) >= threshold:
+                assert tgt_pos in candidates.get(src_pos, [])
@@ -0,0 +1,27 @@
+import random
+
+import pandas as pd
+import pytest
+
+from batch_engine.matching import match_records
+from batch_engine.row_store import RowStore
+
+
+def _random_value(rng):
+    return rng.choice(['PO1', 'po1', 'PO 1', 'PO12', 'ORDER PO1', '1', 1, 1.0, 12, None, ''])
+
+
+@pytest.mark.parametrize('match_type', ['Exact', 'Case-Insensitive', 'Prefix', 'Suffix', 'Contains/Substr'])
+@pytest.mark.parametrize('seed', range(20))
+def test_blocked_rules_without_code_block_match_like_a_full_scan(match_type, seed):
+    rng = random.Random(seed)
+    df_source = pd.DataFrame({'po_number': [_random_value(rng) for _ in range(rng.randint(1, 12))]})
+    df_target = pd.DataFrame({'purchase_order': [_random_value(rng) for _ in range(rng.randint(1, 12))]})
+
+    def run(options):
+        rule = {'rule_id': 1, 'match_type': match_type, 'source_field': 'po_number',
+                'target_field': 'purchase_order', 'options': options}
+        kept = match_records([rule], df_source, df_target, RowStore(df_source), RowStore(df_target))
+        return [(src_pos, tgt_pos) for src_pos, tgt_pos, _ in kept]
+
+    assert run({}) == run({'blocking': False})
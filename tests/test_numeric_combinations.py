@@ -0,0 +1,74 @@
+import itertools
+import random
+
+import pandas as pd
+import pytest
+
+from batch_engine.keys import match_key
+from batch_engine.numeric_combinations import find_combinations
+
+# Budgets no test case comes near, so results never depend on timing
+NO_BUDGET = {'time_budget_seconds': 60, 'table_budget_seconds': 60, 'max_solutions': 10 ** 6}
+
+
+def _rule(**options):
+    return {'rule_id': 1, 'source_field': 'amount', 'target_field': 'paid', 'options': {**NO_BUDGET, **options}}
+
+
+def _brute_force(source, target, max_size, tolerance, source_groups=None, target_groups=None):
+    """Every set of at most max_size target positions summing to each source amount, in cents."""
+    cents = lambda value: int(round(value * 100))
+    combinations = {}
+    for src_pos, amount in enumerate(source):
+        found = set()
+        for size in range(1, max_size + 1):
+            for chosen in itertools.combinations(range(len(target)), size):
+                if source_groups is not None and any(
+                        match_key(target_groups[tgt_pos]) != match_key(source_groups[src_pos]) for tgt_pos in chosen):
+                    continue
+                if abs(sum(cents(target[tgt_pos]) for tgt_pos in chosen) - cents(amount)) <= cents(tolerance):
+                    found.add(chosen)
+        if found:
+            combinations[src_pos] = found
+    return combinations
+
+
+def _found(rule, df_source, df_target):
+    return {src_pos: set(found) for src_pos, found in find_combinations(rule, df_source, df_target).items()}
+
+
+@pytest.mark.parametrize('seed', range(40))
+def test_combinations_equal_brute_force(seed):
+    rng = random.Random(seed)
+    # Negative amounts switch off the running-sum cap
+    low = -5 if seed % 4 == 0 else 0
+    source = [rng.randint(low, 20) + rng.choice([0, 0.5]) for _ in range(rng.randint(1, 6))]
+    target = [rng.randint(low, 10) + rng.choice([0, 0.5]) for _ in range(rng.randint(0, 9))]
+    max_size = rng.randint(1, 4)
+    tolerance = rng.choice([0, 0, 0.5, 1])
+    rule = _rule(max_combination_size=max_size, tolerance=tolerance)
+    found = _found(rule, pd.DataFrame({'amount': source}), pd.DataFrame({'paid': target}))
+    assert found == _brute_force(source, target, max_size, tolerance)
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_combinations_stay_within_a_group(seed):
+    rng = random.Random(seed)
+    source = [rng.randint(1, 12) for _ in range(rng.randint(1, 5))]
+    target = [rng.randint(1, 6) for _ in range(rng.randint(1, 8))]
+    source_groups = [rng.choice(['A', 'a ', 'B']) for _ in source]
+    target_groups = [rng.choice(['A', 'B', 'b']) for _ in target]
+    rule = _rule(source_group_field='account', target_group_field='account_code')
+    df_source = pd.DataFrame({'amount': source, 'account': source_groups})
+    df_target = pd.DataFrame({'paid': target, 'account_code': target_groups})
+    assert _found(rule, df_source, df_target) == _brute_force(source, target, 3, 0, source_groups, target_groups)
+
+
+@pytest.mark.parametrize('max_solutions', [1, 2, 5])
+def test_at_most_max_solutions_are_returned(max_solutions):
+    source = [10]
+    target = [1, 2, 3, 4, 5, 6, 7, 9]
+    rule = _rule(max_solutions=max_solutions)
+    found = find_combinations(rule, pd.DataFrame({'amount': source}), pd.DataFrame({'paid': target}))
+    assert len(found[0]) == max_solutions
+    assert set(found[0]) <= _brute_force(source, target, 3, 0)[0]
@@ -0,0 +1,40 @@
+import json
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from batch_engine.result_store import ResultStore, ResultWriter
+from batch_engine.row_store import RowStore
+
+
+def _strict_json(line):
+    def reject(constant):
+        raise ValueError(f"{constant} is not valid JSON")
+    return json.loads(line, parse_constant=reject)
+
+
+@pytest.mark.parametrize('df', [
+    pd.DataFrame({'amount': [1.5, np.nan, np.inf, -np.inf]}),
+    pd.DataFrame({'amount': [1.5, np.nan, np.inf, -np.inf], 'name': ['a', None, 'c', np.nan]}),
+    pd.DataFrame({'paid_on': pd.to_datetime(['2024-01-01', None, '2024-01-03', None]), 'name': ['a', 'b', None, 'd']}),
+])
+def test_records_are_stored_with_missing_and_infinite_values_as_null(df, tmp_path):
+    store = RowStore(df)
+    writer = ResultWriter(str(tmp_path))
+    writer.add_records('source', store)
+    writer.add_records('target', store)
+    writer.add('matched', {'source_index': 0, 'target_index': 0, 'source_record': store.record(0),
+                           'target_record': store.record(0), 'rule_id': 1, 'score': 100})
+    writer.close([{'rule_id': 1}])
+
+    with open(tmp_path / 'source_records.jsonl', 'r', encoding='utf-8') as f:
+        stored = [_strict_json(line) for line in f]
+    for record, row in zip(stored, df.astype(object).to_dict('records')):
+        for column, value in row.items():
+            missing = pd.isna(value) or (isinstance(value, float) and math.isinf(value))
+            assert (record[column] is None) == missing
+    assert ResultStore(str(tmp_path)).read('matched')[0]['source_record'] == stored[0]
+    # Rules keep comparing the original values
+    assert store.column(df.columns[0])[1] is not None
@@ -0,0 +1,97 @@
+import copy
+import random
+
+import pandas as pd
+import pytest
+
+from batch_engine.matching import match_records
+from batch_engine.row_store import RowStore
+from batch_engine.rule_hits import RuleHits, load_rule_hits
+
+CODE_BLOCKS = [
+    'def rule_code_block(source_value, target_value):\n    return str(source_value) == str(target_value)',
+    'def rule_code_block(source_value, target_value):\n    return str(source_value).lower() in str(target_value).lower()',
+    'def rule_code_block(source_value, target_value):\n    return str(target_value).startswith(str(source_value)[:1])',
+    'def rule_code_block(source_value, target_value):\n    return len(str(source_value)) == len(str(target_value))',
+]
+WEIGHTS = [30, 60, 100, 150]
+
+
+def _frames(rng):
+    values = ['a', 'A', 'ab', 'b', 'ba', 'abc', None]
+    size_source, size_target = rng.randint(1, 12), rng.randint(1, 12)
+    df_source = pd.DataFrame({
+        'code': [rng.choice(values) for _ in range(size_source)],
+        'amount': [rng.randint(1, 9) for _ in range(size_source)]
+    })
+    df_target = pd.DataFrame({
+        'ref': [rng.choice(values) for _ in range(size_target)],
+        'paid': [rng.randint(1, 5) for _ in range(size_target)]
+    })
+    return df_source, df_target
+
+
+def _random_rule(rng, rule_id):
+    rule = {'rule_id': rule_id, 'rule_name': f'Rule {rule_id}', 'source_field': 'code', 'target_field': 'ref',
+            'match_classification': 'Match', 'is_active': True, 'weight': rng.choice(WEIGHTS)}
+    kind = rng.random()
+    if kind < 0.6:
+        rule['match_type'] = rng.choice(['Exact', 'Contains/Substr', 'Prefix'])
+        rule['code_block'] = rng.choice(CODE_BLOCKS)
+        if rng.random() < 0.5:
+            rule['options'] = {'blocking': True}
+    elif kind < 0.8:
+        rule['match_type'] = rng.choice(['Exact', 'Case-Insensitive', 'Contains/Substr'])
+        rule['declarative'] = True
+    else:
+        rule.update({'match_type': 'Numeric Combinations', 'source_field': 'amount', 'target_field': 'paid',
+                     'options': {'max_combination_size': 2, 'time_budget_seconds': 60, 'table_budget_seconds': 60}})
+    if rng.random() < 0.15:
+        rule['tie-breaker'] = True
+    return rule
+
+
+def _edit(rng, rule):
+    """A copy of rule with one of the keys that do or do not change its hits edited."""
+    rule = copy.deepcopy(rule)
+    change = rng.choice(['weight', 'rule_name', 'code_block', 'options', 'tie-breaker'])
+    if change == 'weight':
+        rule['weight'] = rng.choice(WEIGHTS)
+    elif change == 'rule_name':
+        rule['rule_name'] += ' (edited)'
+    elif change == 'code_block' and 'code_block' in rule:
+        rule['code_block'] = rng.choice(CODE_BLOCKS)
+    elif change == 'options' and rule['match_type'] == 'Numeric Combinations':
+        rule['options']['max_combination_size'] = rng.randint(1, 3)
+    elif change == 'tie-breaker':
+        rule['tie-breaker'] = not rule.get('tie-breaker', False)
+    return rule
+
+
+def _run(rules, df_source, df_target, previous=None, rule_hits=None):
+    kept = match_records(rules, df_source, df_target, RowStore(df_source), RowStore(df_target),
+                         previous=previous, rule_hits=rule_hits)
+    return [(src_pos, tgt_pos, state['rule']['rule_id'], state['score'], state['combination'])
+            for src_pos, tgt_pos, state in kept]
+
+
+@pytest.mark.parametrize('seed', range(100))
+def test_re_run_with_recorded_hits_equals_a_full_run(seed, tmp_path):
+    rng = random.Random(seed)
+    df_source, df_target = _frames(rng)
+    rules = [_random_rule(rng, rule_id) for rule_id in range(1, rng.randint(3, 9))]
+    rule_hits = RuleHits('source.csv', 'target.csv')
+    _run(rules, df_source, df_target, rule_hits=rule_hits)
+    rule_hits.save(str(tmp_path))
+    previous = load_rule_hits(str(tmp_path), 'source.csv', 'target.csv')
+    assert previous is not None
+
+    edited = [_edit(rng, rule) if rng.random() < 0.5 else rule for rule in rules]
+    if rng.random() < 0.3:
+        edited.append(_random_rule(rng, len(rules) + 1))
+    assert _run(edited, df_source, df_target, previous=previous) == _run(edited, df_source, df_target)
+
+
+def test_rule_hits_of_other_files_are_not_loaded(tmp_path):
+    RuleHits('source.csv', 'target.csv').save(str(tmp_path))
+    assert load_rule_hits(str(tmp_path), 'source.csv', 'other.csv') is None
@@ -0,0 +1,69 @@
+import random
+
+import pandas as pd
+import pytest
+
+from batch_engine.keys import match_key
+from batch_engine.matchers import candidate_targets
+from batch_engine.substring_index import AhoCorasick, SubstringIndex
+
+CODE_BLOCK = 'def rule_code_block(source_value, target_value):\n    return str(source_value)[2:] in str(target_value)'
+
+
+def _random_text(rng, alphabet, max_length):
+    return ''.join(rng.choice(alphabet) for _ in range(rng.randint(0, max_length)))
+
+
+@pytest.mark.parametrize('seed', range(50))
+def test_aho_corasick_finds_what_a_substring_scan_finds(seed):
+    rng = random.Random(seed)
+    # A small alphabet gives overlapping patterns, patterns inside patterns and long failure chains
+    alphabet = 'ab' if seed % 2 else 'abc'
+    patterns = list({_random_text(rng, alphabet, 5) or 'a' for _ in range(rng.randint(1, 30))})
+    automaton = AhoCorasick(patterns)
+    for _ in range(30):
+        text = _random_text(rng, alphabet, 20)
+        expected = {pattern_id for pattern_id, pattern in enumerate(patterns) if pattern in text}
+        assert automaton.find_all(text) == expected
+
+
+def _random_value(rng):
+    kind = rng.random()
+    if kind < 0.1:
+        return None
+    if kind < 0.2:
+        return rng.choice([1, 12, 12.0, 2.5, 21])
+    if kind < 0.3:
+        return ' '
+    # Case and inner whitespace are folded away by match_key
+    return ''.join(rng.choice('aAb ') for _ in range(rng.randint(1, 6)))
+
+
+@pytest.mark.parametrize('seed', range(50))
+def test_substring_index_candidates_equal_a_full_scan(seed):
+    rng = random.Random(seed)
+    source_values = [_random_value(rng) for _ in range(rng.randint(0, 25))]
+    target_values = [_random_value(rng) for _ in range(rng.randint(0, 25))]
+    expected = {}
+    for src_pos, src_value in enumerate(source_values):
+        tgt_positions = [tgt_pos for tgt_pos, tgt_value in enumerate(target_values)
+                         if match_key(src_value) in match_key(tgt_value)]
+        if tgt_positions:
+            expected[src_pos] = tgt_positions
+    candidates = SubstringIndex(target_values).candidates(source_values)
+    assert {src_pos: tgt_positions for src_pos, tgt_positions in candidates.items() if tgt_positions} == expected
+
+
+@pytest.mark.parametrize('rule, blocked', [
+    ({}, True),
+    ({'options': {'blocking': False}}, False),
+    ({'code_block': CODE_BLOCK}, False),
+    ({'code_block': CODE_BLOCK, 'options': {'blocking': True}}, True),
+])
+def test_only_rules_whose_comparison_is_never_looser_than_the_key_are_blocked(rule, blocked):
+    rule = {'rule_id': 1, 'match_type': 'Contains/Substr', 'source_field': 'po_number',
+            'target_field': 'purchase_order', **rule}
+    df_source = pd.DataFrame({'po_number': ['PO1', 'PO2']})
+    df_target = pd.DataFrame({'purchase_order': ['ORDER PO1', 'ORDER PO3']})
+    candidates = candidate_targets(rule, df_source, df_target)
+    assert candidates == ({0: [0]} if blocked else None)